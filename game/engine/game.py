@@ -1,57 +1,100 @@
-import sys
-import time
-import os
 import curses
 import argparse
+import textwrap
 from typing import List, Dict, Any, Optional
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
 from game.engine.input_handler import InputHandler
 from game.engine.renderer import Renderer
 from game.entities.player import Player
+from game.entities.npc import cancel_summaries, pop_summary_errors
 from game.entities.npc_generator import NPCGenerator
-from game.world.dungeon import Dungeon
+from game.world.dungeon import Dungeon, roll_character_counts
 from game.world.map_generator import MapGenerator
 
+# How long getch waits for a key before the loop runs an AI tick anyway
+TICK_MS = 100
+
+# Color pairs only need to be set up once per curses session
+_COLORS_INITIALIZED = False
+
+
+def _init_colors():
+    """Initialize the color pairs used by the game, once."""
+    global _COLORS_INITIALIZED
+    if _COLORS_INITIALIZED:
+        return
+        
+    curses.start_color()
+    curses.use_default_colors()
+    
+    # Initialize color pairs
+    curses.init_pair(1, curses.COLOR_WHITE, -1)  # Default
+    curses.init_pair(2, curses.COLOR_GREEN, -1)  # Player
+    curses.init_pair(3, curses.COLOR_RED, -1)    # Enemy
+    curses.init_pair(4, curses.COLOR_YELLOW, -1) # Items
+    curses.init_pair(5, curses.COLOR_BLUE, -1)   # NPCs
+    _COLORS_INITIALIZED = True
+
 
 class Game:
     """Main game engine class that manages the game state and loop."""
     
-    def __init__(self, use_pregenerated=False, save_characters=True, philosophical_mode=False):
+    def __init__(self, use_pregenerated=False, save_characters=True, philosophical_mode=False,
+                 reuse_characters=0.0):
         self.running = False
         self.player = None
         self.dungeon = None
         self.current_level = 0
+        # NPC and enemy counts of the next level, picked when its characters start generating
+        self._next_level_counts = None
         self.input_handler = InputHandler()
         self.renderer = None
         self.npc_generator = NPCGenerator(
             use_pregenerated=use_pregenerated, 
             save_generated=save_characters,
-            philosophical_mode=philosophical_mode
+            philosophical_mode=philosophical_mode,
+            reuse_probability=reuse_characters
         )
-        self.game_log = []
         self.max_log_size = 100
+        self.game_log = deque(maxlen=self.max_log_size)  # Oldest messages drop off automatically
+        self._log_tail = []  # The most recent 20 messages, shown in the normal view
         self.use_pregenerated = use_pregenerated
         self.save_characters = save_characters
         self.philosophical_mode = philosophical_mode
         self.viewing_history = False
         self.history_offset = 0
+        # Lines shown in the history view; rebuilt only when the log or offset changes
+        self._cached_history_view = []
+        self._history_dirty = True
+        # Set when the UI needs redrawing for reasons the dungeon doesn't track
+        self._ui_dirty = True
+        # Dungeon and tiles version last drawn into the renderer's background
+        self._background_key = None
+        # Wraps dialogue into log lines; long words are kept whole
+        self.dialogue_wrapper = textwrap.TextWrapper(width=70, break_long_words=False)
+        # LLM dialogue runs on worker threads so the game loop never waits on it
+        self.llm_pool = ThreadPoolExecutor(max_workers=2)
+        self.pending_dialogue = {}  # Character -> Future resolving to its reply
+        self.partial_dialogue = {}  # Character -> text of its reply received so far
+        # Characters the player is currently talking to
+        self.current_npc = None
+        self.current_enemy = None
         
     def setup(self, stdscr):
         """Initialize game components."""
         curses.curs_set(0)  # Hide cursor
-        curses.start_color()
-        curses.use_default_colors()
         
-        # Initialize color pairs
-        curses.init_pair(1, curses.COLOR_WHITE, -1)  # Default
-        curses.init_pair(2, curses.COLOR_GREEN, -1)  # Player
-        curses.init_pair(3, curses.COLOR_RED, -1)    # Enemy
-        curses.init_pair(4, curses.COLOR_YELLOW, -1) # Items
-        curses.init_pair(5, curses.COLOR_BLUE, -1)   # NPCs
+        # Block in getch until a key arrives or the next AI tick is due
+        stdscr.nodelay(False)
+        stdscr.timeout(TICK_MS)
+        
+        _init_colors()
         
-        # Setup renderer with the screen
-        self.renderer = Renderer(stdscr)
+        # Setup renderer with the screen (after the color pairs it caches exist)
+        self.renderer = Renderer(stdscr, color_pairs=5)
         
         # Create player
         self.player = Player("Adventurer", x=1, y=1, hp=100, max_hp=100, attack=10)
@@ -95,85 +138,41 @@ class Game:
         self.player.x, self.player.y = valid_pos
         
         # Generate NPCs and enemies for this level
-        self.dungeon.populate_entities(self.npc_generator, level=self.current_level)
+        self.dungeon.populate_entities(self.npc_generator, level=self.current_level,
+                                       counts=self._next_level_counts)
+        
+        # Start generating the next level's characters now, so descending doesn't wait on the LLM
+        self._next_level_counts = roll_character_counts(self.current_level + 1)
+        self.npc_generator.warm_up(self.current_level + 1, *self._next_level_counts)
+        
+        # Prepare NPC greetings in the background when characters are reused or kept
+        if self.use_pregenerated or self.save_characters:
+            self.npc_generator.prefetch_greetings(list(self.dungeon.npcs))
         
         # Verify that a path exists from player to stairs
-        # Find stairs
-        stairs_pos = None
-        for x in range(self.dungeon.width):
-            for y in range(self.dungeon.height):
-                if self.dungeon.tiles[x][y] == 2:  # Stairs
-                    stairs_pos = (x, y)
-                    break
-            if stairs_pos:
-                break
+        # The map generator records where it placed the stairs
+        stairs_pos = self.dungeon.stairs_pos
                 
         if stairs_pos:
-            # Use the path verification from map_generator
-            
-            # Verify that a path exists using BFS
-            has_path = self._verify_path((self.player.x, self.player.y), stairs_pos)
+            # Check again now that characters stand in the way; the dungeon runs the
+            # same path check and carving as the map generator
+            has_path = self.dungeon.has_path((self.player.x, self.player.y), stairs_pos)
             
             if not has_path:
                 # Force create a path if necessary
-                self._create_direct_path((self.player.x, self.player.y), stairs_pos)
+                self.dungeon.carve_direct_path((self.player.x, self.player.y), stairs_pos)
                 self.add_to_log("Emergency path to stairs created!")
             else:
                 self.add_to_log(f"Level {self.current_level} generated with valid path to exit.")
     
-    def _verify_path(self, start, end):
-        """
-        Use BFS to verify that a path exists from start to end.
-        Returns True if a path exists, False otherwise.
-        """
-        # Create a visited set
-        visited = set()
-        queue = deque([start])
-        
-        # Directions: up, right, down, left
-        directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
-        
-        while queue:
-            current = queue.popleft()
-            
-            if current == end:
-                return True
-                
-            if current in visited:
-                continue
-                
-            visited.add(current)
-            
-            # Check all adjacent tiles
-            for dx, dy in directions:
-                next_x, next_y = current[0] + dx, current[1] + dy
-                
-                # Check if walkable and not visited
-                if (self.dungeon.is_walkable(next_x, next_y) and 
-                    (next_x, next_y) not in visited):
-                    queue.append((next_x, next_y))
-        
-        # If queue is empty and end not found, no path exists
-        return False
-        
-    def _create_direct_path(self, start, end):
-        """Create a direct path from start to end coordinates."""
-        x1, y1 = start
-        x2, y2 = end
-        
-        # First carve horizontal tunnel
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            self.dungeon.tiles[x][y1] = 1  # Floor
-        
-        # Then carve vertical tunnel
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            self.dungeon.tiles[x2][y] = 1  # Floor
-    
     def add_to_log(self, message: str):
         """Add a message to the game log."""
         self.game_log.append(message)
-        if len(self.game_log) > self.max_log_size:
-            self.game_log.pop(0)
+        self._log_tail.append(message)
+        if len(self._log_tail) > 20:
+            self._log_tail.pop(0)
+        self._history_dirty = True
+        self._ui_dirty = True
     
     def _view_dialogue_history(self, key=None):
         """View and navigate dialogue history."""
@@ -188,9 +187,11 @@ class Game:
         if key == "KEY_UP" and self.history_offset < len(self.game_log) - 10:
             # Scroll larger amounts with UP key
             self.history_offset += 5
+            self._history_dirty = True
         elif key == "KEY_DOWN" and self.history_offset > 0:
             # Scroll larger amounts with DOWN key
             self.history_offset = max(0, self.history_offset - 5)
+            self._history_dirty = True
         elif key == "ESCAPE":
             # Exit history view
             self.viewing_history = False
@@ -278,26 +279,17 @@ class Game:
                 return
                 
         # Initial greeting if this is the first interaction
-        if not hasattr(self, 'current_npc') or self.current_npc != npc:
+        if self.current_npc is not npc:
             self.current_npc = npc
             
-            # Generate initial greeting with Claude 3.7 Sonnet
-            initial_greeting = npc.talk("*You approach the character*")
-            
-            # Add NPC name as a separate line for clarity
-            self.add_to_log(f"{npc.name}:")
-            
-            # Split long dialogue into multiple log entries
-            self._display_dialogue(initial_greeting)
-            
-            # Prompt player for response
-            self.add_to_log("(Type your response and press Enter, or just press Enter to leave)")
+            # Generate initial greeting with Claude in the background
+            self._request_dialogue(npc, "*You approach the character*")
             
             # Enter conversation mode
-            self._get_player_input()
+            self._converse(npc, 'current_npc')
         else:
             # Already in conversation with this NPC
-            self._get_player_input()
+            self._converse(npc, 'current_npc')
     
     def _interact_with_enemy(self, enemy=None):
         """Interact with an enemy."""
@@ -309,33 +301,43 @@ class Game:
                 return
                 
         # Initial greeting if this is the first interaction
-        if not hasattr(self, 'current_enemy') or self.current_enemy != enemy:
+        if self.current_enemy is not enemy:
             self.current_enemy = enemy
             
-            # Generate initial greeting with Claude 3.7 Sonnet
-            initial_greeting = enemy.talk("*You approach the enemy*")
-            
-            # Add enemy name as a separate line for clarity
-            self.add_to_log(f"{enemy.name}:")
-            
-            # Split long dialogue into multiple log entries
-            self._display_dialogue(initial_greeting)
-            
-            # Prompt player for response
-            self.add_to_log("(Type your response and press Enter, or just press Enter to leave)")
+            # Generate initial greeting with Claude in the background
+            self._request_dialogue(enemy, "*You approach the enemy*")
             self.add_to_log("(WARNING: Talking does not prevent combat!)")
             
             # Enter conversation mode
-            self._get_player_input_enemy()
+            self._converse(enemy, 'current_enemy')
         else:
             # Already in conversation with this enemy
-            self._get_player_input_enemy()
+            self._converse(enemy, 'current_enemy')
     
-    def _get_player_input(self):
-        """Get text input from the player for NPC conversation."""
-        if not self.renderer or not hasattr(self, 'current_npc'):
+    def _converse(self, partner, attr_name):
+        """Hold a conversation with the character stored in attr_name until the player leaves."""
+        if not self.renderer:
             return
             
+        # Create input area at the bottom of the screen, reused for every line
+        h, w = self.renderer.stdscr.getmaxyx()
+        input_win = curses.newwin(1, w, h-1, 0)
+        input_win.timeout(TICK_MS)  # Wake up regularly to show replies that arrive while typing
+        
+        while getattr(self, attr_name) is partner:
+            input_str = self._read_line(input_win, partner)
+            
+            # Exit conversation if input is empty
+            if not input_str.strip():
+                setattr(self, attr_name, None)
+                self.add_to_log("You end the conversation.")
+            else:
+                # Ask the character for a response; it is displayed once it arrives
+                self.add_to_log(f"You: {input_str}")
+                self._request_dialogue(partner, input_str)
+    
+    def _read_line(self, input_win, partner):
+        """Read a line of conversation from the player in the input window."""
         # Save current game state
         was_viewing_history = self.viewing_history
         self.viewing_history = False
@@ -344,9 +346,6 @@ class Game:
         curses.echo()  # Show typed characters
         curses.curs_set(1)  # Show cursor
         
-        # Create input area at the bottom of the screen
-        h, w = self.renderer.stdscr.getmaxyx()
-        input_win = curses.newwin(1, w, h-1, 0)
         input_win.clear()
         input_win.addstr(0, 0, "> ")
         input_win.refresh()
@@ -367,10 +366,16 @@ class Game:
             try:
                 key = input_win.getkey()
             except:
+                # No key before the timeout; show any replies that have arrived
+                self._poll_dialogue()
                 continue
                 
             # Process key
             if key == "\n" or key == "\r":  # Enter key
+                if input_str.strip() and partner in self.pending_dialogue:
+                    # Keep the typed text until the previous reply has arrived
+                    self.add_to_log(f"({partner.name} is still thinking...)")
+                    continue
                 break
             elif key == "KEY_BACKSPACE" or key == "\b" or key == "\x7f":
                 if input_pos > 2:
@@ -384,121 +389,66 @@ class Game:
         curses.noecho()
         curses.curs_set(0)  # Hide cursor
         self.viewing_history = was_viewing_history
-                
-        # Exit input mode if input is empty
-        if not input_str.strip():
-            self.current_npc = None
-            self.add_to_log("You end the conversation.")
+        
+        # The input window drew over the bottom row behind the renderer's back
+        self.renderer.invalidate()
+        
+        return input_str
+    
+    def _request_dialogue(self, character, query):
+        """Ask a character for a reply on the LLM worker pool."""
+        if character in self.pending_dialogue:
+            self.add_to_log(f"{character.name} is still thinking...")
             return
-        else:
-            # Get response from the NPC and display it
-            self.add_to_log(f"You: {input_str}")
-            response = self.current_npc.talk(input_str)
             
-            self.add_to_log(f"{self.current_npc.name}:")
-            self._display_dialogue(response)
-            
-            # Continue conversation
-            self.add_to_log("(Type your response and press Enter, or just press Enter to leave)")
+        def show_partial(text):
+            # Called on the worker thread as the reply streams in; render() picks it up
+            self.partial_dialogue[character] = text
+            self._ui_dirty = True
             
-            # Recursively call this function to continue the conversation
-            self._get_player_input()
+        self.pending_dialogue[character] = self.llm_pool.submit(character.talk, query, show_partial)
+        self.add_to_log(f"{character.name} is thinking...")
     
-    def _get_player_input_enemy(self):
-        """Get text input from the player for enemy conversation."""
-        if not self.renderer or not hasattr(self, 'current_enemy'):
-            return
-            
-        # Save current game state
-        was_viewing_history = self.viewing_history
-        self.viewing_history = False
-        
-        # Get input from the player
-        curses.echo()  # Show typed characters
-        curses.curs_set(1)  # Show cursor
-        
-        # Create input area at the bottom of the screen
-        h, w = self.renderer.stdscr.getmaxyx()
-        input_win = curses.newwin(1, w, h-1, 0)
-        input_win.clear()
-        input_win.addstr(0, 0, "> ")
-        input_win.refresh()
-        
-        # Get player input (up to 70 chars)
-        input_str = ""
-        input_pos = 2  # Start after "> "
-        
-        while True:
-            # Render current state to keep display updated
-            self.render()
-            input_win.clear()
-            input_win.addstr(0, 0, f"> {input_str}")
-            input_win.move(0, input_pos)
-            input_win.refresh()
+    def _poll_dialogue(self):
+        """Display the replies of characters whose LLM call has finished."""
+        for error in pop_summary_errors() + self.npc_generator.pop_errors():
+            self.add_to_log(error)
             
-            # Get key
-            try:
-                key = input_win.getkey()
-            except:
+        for character, future in list(self.pending_dialogue.items()):
+            if not future.done():
                 continue
                 
-            # Process key
-            if key == "\n" or key == "\r":  # Enter key
-                break
-            elif key == "KEY_BACKSPACE" or key == "\b" or key == "\x7f":
-                if input_pos > 2:
-                    input_str = input_str[:-1]
-                    input_pos -= 1
-            elif len(input_str) < 70 and key.isprintable():
-                input_str += key
-                input_pos += 1
-        
-        # Clean up input mode
-        curses.noecho()
-        curses.curs_set(0)  # Hide cursor
-        self.viewing_history = was_viewing_history
+            del self.pending_dialogue[character]
+            self.partial_dialogue.pop(character, None)
+            try:
+                response = future.result()
+            except Exception as e:
+                self.add_to_log(f"{character.name} doesn't respond. ({e})")
+                continue
                 
-        # Exit input mode if input is empty
-        if not input_str.strip():
-            self.current_enemy = None
-            self.add_to_log("You end the conversation.")
-            return
-        else:
-            # Get response from the enemy and display it
-            self.add_to_log(f"You: {input_str}")
-            response = self.current_enemy.talk(input_str)
+            # Add the character's name as a separate line for clarity
+            self.add_to_log(f"{character.name}:")
             
-            self.add_to_log(f"{self.current_enemy.name}:")
+            # Split long dialogue into multiple log entries
             self._display_dialogue(response)
             
-            # Continue conversation
-            self.add_to_log("(Type your response and press Enter, or just press Enter to leave)")
-            
-            # Recursively call this function to continue the conversation
-            self._get_player_input_enemy()
+            # Prompt player for response if the conversation is still going
+            if character is self.current_npc or character is self.current_enemy:
+                self.add_to_log("(Type your response and press Enter, or just press Enter to leave)")
+    
+    def _partial_log_lines(self):
+        """Log lines showing the replies received so far from characters still talking."""
+        lines = []
+        for character, text in list(self.partial_dialogue.items()):
+            lines.append(f"{character.name}:")
+            lines.extend(f"  {line}" for line in self.dialogue_wrapper.wrap(text))
+        return lines
     
     def _display_dialogue(self, dialogue):
         """Split and display dialogue in the game log."""
         # Break longer dialogue into manageable chunks to ensure everything is displayed
-        words = dialogue.split()
-        current_line = ""
-        
-        for word in words:
-            # If adding this word would exceed the line limit
-            if len(current_line) + len(word) + 1 > 70:
-                # Add the current line to the log and start a new one
-                self.add_to_log(f"  {current_line}")
-                current_line = word
-            else:
-                # Add the word to the current line
-                if current_line:
-                    current_line += " " + word
-                else:
-                    current_line = word
-        
-        # Make sure to add the last line if there's anything left
-        if current_line:
-            self.add_to_log(f"  {current_line}")
+        for line in self.dialogue_wrapper.wrap(dialogue):
+            self.add_to_log(f"  {line}")
     
     def _attack_enemy(self):
         """Attack an enemy if one is adjacent to the player."""
@@ -525,6 +475,9 @@ class Game:
             
     def update(self):
         """Update game state."""
+        # Show replies from characters that have finished thinking
+        self._poll_dialogue()
+        
         # AI updates for NPCs and enemies
         self.dungeon.update_entities(self.player)
             
@@ -533,11 +486,17 @@ class Game:
         if not self.renderer:
             return
             
+        # Render dungeon tiles into the background, only when they have changed
+        background_key = (self.dungeon, self.dungeon.tiles_version)
+        if background_key != self._background_key:
+            self.renderer.clear_background()
+            self.dungeon.render(self.renderer)
+            self.renderer.save_background()
+            self._background_key = background_key
+            
+        # Compose the frame on top of the background; the renderer only writes changed cells
         self.renderer.clear()
         
-        # Render dungeon
-        self.dungeon.render(self.renderer)
-        
         # Render entities
         self.dungeon.render_entities(self.renderer)
         
@@ -547,39 +506,53 @@ class Game:
         # Render UI
         if self.viewing_history:
             # Display history view with offset - increased from 20 to 30 lines
-            history_view = self.game_log[-min(len(self.game_log), 30+self.history_offset):-self.history_offset] if self.history_offset > 0 else self.game_log[-min(len(self.game_log), 30):]
+            if self._history_dirty:
+                # The 30 lines ending history_offset lines before the newest one
+                end = len(self.game_log) - self.history_offset
+                self._cached_history_view = list(islice(self.game_log, max(0, end - 30), end))
+                self._history_dirty = False
             self.renderer.draw_ui(
                 player=self.player,
                 dungeon_level=self.current_level + 1,
-                log=history_view
+                log=self._cached_history_view
             )
         else:
-            # Normal game view
+            # Normal game view, with replies that are still streaming in below the log
+            log = self._log_tail  # Only show the most recent 20 lines in normal view
+            if self.partial_dialogue:
+                log = log + self._partial_log_lines()
             self.renderer.draw_ui(
                 player=self.player,
                 dungeon_level=self.current_level + 1,
-                log=self.game_log[-min(len(self.game_log), 20):]  # Only show the most recent 20 lines in normal view
+                log=log
             )
         
         self.renderer.refresh()
+        self._ui_dirty = False
+        self.dungeon.changed = False
         
     def run(self, stdscr):
         """Main game loop."""
         self.setup(stdscr)
         
         while self.running:
-            # Render current state
-            self.render()
+            # Render current state, unless nothing on screen can have changed
+            if self._ui_dirty or self.dungeon.changed:
+                self.render()
             
-            # Get and handle input
+            # Wait for input; getch returns no key once the tick timeout expires
             key = self.input_handler.get_input(stdscr)
-            self.handle_input(key)
+            if key is not None:
+                self.handle_input(key)
+                self._ui_dirty = True  # The key may have moved the player or switched views
             
-            # Update game state
+            # Update game state (runs on every key and on every idle tick)
             self.update()
             
-            # Small delay to prevent CPU overuse
-            time.sleep(0.05)
+        # Don't keep the game open for dialogue, summaries or characters nobody will see
+        self.llm_pool.shutdown(wait=False, cancel_futures=True)
+        self.npc_generator.close()
+        cancel_summaries()
 
 
 def parse_arguments():
@@ -600,6 +573,13 @@ def parse_arguments():
         action="store_true",
         help="Generate characters that discuss advanced STEM/philosophical concepts"
     )
+    parser.add_argument(
+        "--reuse-characters",
+        type=float,
+        default=0.0,
+        metavar="PROBABILITY",
+        help="Chance (0-1) of reusing a saved character for a level instead of generating a new one"
+    )
     return parser.parse_args()
 
 
@@ -609,9 +589,15 @@ def main():
     game = Game(
         use_pregenerated=args.use_pregenerated,
         save_characters=not args.no_save_characters,
-        philosophical_mode=args.philosophical_mode
+        philosophical_mode=args.philosophical_mode,
+        reuse_characters=args.reuse_characters
     )
     curses.wrapper(game.run)
+    
+    # Failures nobody saw in the game log, such as those of the save made when quitting
+    game.npc_generator.wait_for_saves()
+    for error in game.npc_generator.pop_errors():
+        print(error)
 
 
 if __name__ == "__main__":
@@ -14,12 +14,18 @@ class InputHandler:
             curses.KEY_ENTER: "KEY_ENTER",
             27: "ESCAPE",  # ESC key
         }
+        
+        # Key strings indexed by key code for every code up to curses.KEY_MAX,
+        # so the common keys need neither a dict lookup nor a chr() call
+        self._key_table = [chr(code) for code in range(curses.KEY_MAX + 1)]
+        for key_code, name in self.key_mapping.items():
+            self._key_table[key_code] = name
     
     def get_input(self, stdscr):
-        """Get input from the user and return a string representation."""
-        # Set timeout for getch (non-blocking input)
-        stdscr.timeout(100)
-        
+        """
+        Get input from the user and return a string representation.
+        Returns None if no key was pressed before the screen's timeout expired.
+        """
         try:
             key_code = stdscr.getch()
             
@@ -27,11 +33,11 @@ class InputHandler:
             if key_code == -1:
                 return None
                 
-            # Handle special keys
-            if key_code in self.key_mapping:
-                return self.key_mapping[key_code]
+            # Handle special keys and standard characters
+            if 0 <= key_code < len(self._key_table):
+                return self._key_table[key_code]
                 
-            # Handle standard characters
+            # Handle characters beyond the table
             try:
                 return chr(key_code)
             except ValueError:
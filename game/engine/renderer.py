@@ -5,10 +5,14 @@ from typing import List, Dict, Any, Optional
 class Renderer:
     """Handles rendering the game state to the terminal using curses."""
     
-    def __init__(self, stdscr):
+    def __init__(self, stdscr, color_pairs: int = 5):
         self.stdscr = stdscr
         self.height, self.width = stdscr.getmaxyx()
         
+        # Look up the curses attribute of each color pair once instead of on every write.
+        # The pairs must already be initialized when the renderer is created.
+        self._color_attrs = [curses.color_pair(n) for n in range(color_pairs + 1)]
+        
         # Game view dimensions
         self.game_width = 80
         self.game_height = 20
@@ -19,59 +23,170 @@ class Renderer:
         # Calculate offsets to center the game view
         self.offset_y = 0
         self.offset_x = max(0, (self.width - self.game_width) // 2)
+        
+        # Frame buffers, one cell per screen position in row-major order.
+        # Drawing goes into the frame being composed; refresh() compares it
+        # with what is already on screen and only writes the cells that changed.
+        size = self.height * self.width
+        self._blank_chars = [" "] * size
+        self._blank_colors = bytearray([1]) * size
+        self._chars = list(self._blank_chars)
+        self._colors = bytearray(self._blank_colors)
+        # Static content (the dungeon tiles) that every new frame starts from
+        self._background_chars = list(self._blank_chars)
+        self._background_colors = bytearray(self._blank_colors)
+        self._screen_chars = list(self._blank_chars)
+        self._screen_colors = bytearray(self._blank_colors)
+        # Set when curses has to repaint even though no cell changed
+        self._needs_refresh = True
     
     def clear(self):
-        """Clear the screen."""
-        self.stdscr.clear()
+        """Start a new frame from the saved background (the terminal itself is not cleared)."""
+        self._chars[:] = self._background_chars
+        self._colors[:] = self._background_colors
+    
+    def clear_background(self):
+        """Start a new blank frame to draw a background into."""
+        self._chars[:] = self._blank_chars
+        self._colors[:] = self._blank_colors
     
-    def refresh(self):
-        """Refresh the screen to display changes."""
-        self.stdscr.refresh()
+    def save_background(self):
+        """Keep the current frame as the background that clear() starts new frames from."""
+        self._background_chars[:] = self._chars
+        self._background_colors[:] = self._colors
+    
+    def refresh(self) -> int:
+        """Write the cells that changed since the last frame and refresh the screen.
+        
+        Returns the number of rows rewritten; the terminal is left alone when it is 0.
+        """
+        width = self.width
+        rows_written = 0
+        chars, colors = self._chars, self._colors
+        screen_chars, screen_colors = self._screen_chars, self._screen_colors
         
+        for row in range(self.height):
+            start = row * width
+            end = start + width
+            if (chars[start:end] == screen_chars[start:end] and
+                    colors[start:end] == screen_colors[start:end]):
+                continue
+            
+            # Find the span of changed cells in this row, scanning in from both ends
+            col = 0
+            while (chars[start + col] == screen_chars[start + col] and
+                   colors[start + col] == screen_colors[start + col]):
+                col += 1
+            last = width - 1
+            while (chars[start + last] == screen_chars[start + last] and
+                   colors[start + last] == screen_colors[start + last]):
+                last -= 1
+            
+            # Write the span as runs of cells sharing a color pair
+            while col <= last:
+                color = colors[start + col]
+                run_end = col + 1
+                while run_end <= last and colors[start + run_end] == color:
+                    run_end += 1
+                self._write(row, col, "".join(chars[start + col:start + run_end]), color)
+                col = run_end
+            
+            screen_chars[start:end] = chars[start:end]
+            screen_colors[start:end] = colors[start:end]
+            rows_written += 1
+        
+        # An unchanged frame needs no escape sequences sent to the terminal
+        if rows_written or self._needs_refresh:
+            self.stdscr.refresh()
+            self._needs_refresh = False
+        return rows_written
+    
+    def invalidate(self):
+        """Force curses to repaint the whole screen, e.g. after another window drew over it."""
+        self.stdscr.touchwin()
+        self._needs_refresh = True
+    
+    def _write(self, row: int, col: int, text: str, color_pair: int):
+        """Write a run of cells to the screen."""
+        try:
+            self.stdscr.addstr(row, col, text, self._color_attrs[color_pair])
+        except curses.error:
+            # This can happen when writing to the bottom-right corner
+            pass
+    
     def draw_tile(self, x: int, y: int, char: str, color_pair: int = 1):
         """Draw a tile at the given coordinates with the specified character and color."""
         # Skip if coordinates are out of bounds
-        if (x < 0 or x >= self.game_width or 
+        if (x < 0 or x >= self.game_width or
             y < 0 or y >= self.game_height):
             return
-            
-        try:
-            self.stdscr.addstr(
-                y + self.offset_y, 
-                x + self.offset_x, 
-                char, 
-                curses.color_pair(color_pair)
-            )
-        except curses.error:
-            # This can happen if trying to write to the bottom-right corner
-            pass
-            
+        
+        row = y + self.offset_y
+        col = x + self.offset_x
+        if row >= self.height or col >= self.width:
+            return
+        
+        index = row * self.width + col
+        self._chars[index] = char
+        self._colors[index] = color_pair
+    
+    def draw_entities(self, entities):
+        """Draw the glyphs of many entities, working out the view bounds once for all of them."""
+        width = self.width
+        max_x = min(self.game_width, width - self.offset_x)
+        max_y = min(self.game_height, self.height - self.offset_y)
+        base = self.offset_y * width + self.offset_x
+        chars, colors = self._chars, self._colors
+        
+        for entity in entities:
+            x, y = entity.x, entity.y
+            if 0 <= x < max_x and 0 <= y < max_y:
+                index = base + y * width + x
+                chars[index] = entity.char
+                colors[index] = entity.color_pair
+    
+    def draw_row(self, x: int, y: int, chars: str, colors: bytes):
+        """Draw a row of tiles starting at the given coordinates, each with its own color pair."""
+        # Skip if the row starts out of bounds
+        if x < 0 or y < 0 or y >= self.game_height:
+            return
+        
+        row = y + self.offset_y
+        col = x + self.offset_x
+        if row >= self.height or col >= self.width:
+            return
+        
+        # Clip the row to the game view and the screen
+        count = min(len(chars), self.game_width - x, self.width - col)
+        start = row * self.width + col
+        self._chars[start:start + count] = chars[:count]
+        self._colors[start:start + count] = colors[:count]
+    
     def draw_string(self, x: int, y: int, text: str, color_pair: int = 1):
         """Draw a string at the given coordinates with the specified color."""
-        try:
-            self.stdscr.addstr(
-                y + self.offset_y, 
-                x + self.offset_x, 
-                text[:self.width - x - 1], 
-                curses.color_pair(color_pair)
-            )
-        except curses.error:
-            # This can happen if trying to write beyond the screen boundaries
-            pass
-            
+        row = y + self.offset_y
+        col = x + self.offset_x
+        if not (0 <= row < self.height and 0 <= col < self.width):
+            return
+        
+        text = text[:self.width - col - 1]
+        start = row * self.width + col
+        self._chars[start:start + len(text)] = text
+        self._colors[start:start + len(text)] = bytes([color_pair]) * len(text)
+    
     def draw_ui(self, player, dungeon_level: int, log: List[str]):
         """Draw the user interface elements."""
         # Draw separator line
         separator_y = self.game_height
         self.draw_string(0, separator_y, "-" * self.game_width)
         
-        # Draw player stats
+        # Draw player stats as one row: HP on the left, dungeon level on the right
         stats_y = separator_y + 1
         hp_text = f"HP: {player.hp}/{player.max_hp}"
         level_text = f"Dungeon Level: {dungeon_level}"
         
-        self.draw_string(2, stats_y, hp_text)
-        self.draw_string(self.game_width - len(level_text) - 2, stats_y, level_text)
+        stats_width = self.game_width - 4
+        self.draw_string(2, stats_y, hp_text.ljust(stats_width - len(level_text)) + level_text)
         
         # Draw game log - showing more lines
         log_y = stats_y + 1
@@ -81,4 +196,4 @@ class Renderer:
         
         for i, message in enumerate(log[-max_display_lines:]):  # Show last N messages
             if i < max_display_lines:  # Ensure we don't overflow
-                self.draw_string(2, log_y + i, message) 
\ No newline at end of file
+                self.draw_string(2, log_y + i, message)
@@ -1,6 +1,12 @@
+import math
+
+
 class Entity:
     """Base class for all game entities."""
     
+    # Fixed attribute slots instead of a per-instance __dict__; subclasses declare their own
+    __slots__ = ("name", "char", "color_pair", "x", "y", "blocks_movement", "entity_type", "dungeon")
+    
     def __init__(
         self,
         name: str,
@@ -18,6 +24,7 @@ class Entity:
         self.y = y
         self.blocks_movement = blocks_movement
         self.entity_type = entity_type
+        self.dungeon = None  # The dungeon the entity has been added to, if any
         
     def render(self, renderer):
         """Render the entity to the screen."""
@@ -29,40 +36,31 @@ class Entity:
         
     def distance_to(self, other_entity) -> float:
         """Calculate the Euclidean distance to another entity."""
-        return ((self.x - other_entity.x) ** 2 + (self.y - other_entity.y) ** 2) ** 0.5
+        return math.hypot(self.x - other_entity.x, self.y - other_entity.y)
+        
+    def distance_sq_to(self, other_entity) -> int:
+        """Calculate the squared distance to another entity, for comparing against a squared range."""
+        dx = self.x - other_entity.x
+        dy = self.y - other_entity.y
+        return dx * dx + dy * dy
         
     def move_towards(self, target_x: int, target_y: int, dungeon) -> bool:
         """Move the entity one step towards the target position."""
-        dx = 0
-        dy = 0
+        x, y = self.x, self.y
+        dx = (target_x > x) - (target_x < x)
+        dy = (target_y > y) - (target_y < y)
         
-        if self.x < target_x:
-            dx = 1
-        elif self.x > target_x:
-            dx = -1
+        # Try to move diagonally first, then horizontally, then vertically
+        if dx and dy:
+            steps = ((dx, dy), (dx, 0), (0, dy))
+        elif dx or dy:
+            steps = ((dx, dy),)  # Already in line with the target
+        else:
+            return False
             
-        if self.y < target_y:
-            dy = 1
-        elif self.y > target_y:
-            dy = -1
-            
-        # Try to move diagonally first
-        if dx != 0 and dy != 0:
-            if dungeon.is_walkable(self.x + dx, self.y + dy):
-                self.x += dx
-                self.y += dy
-                return True
-                
-        # Try to move horizontally
-        if dx != 0:
-            if dungeon.is_walkable(self.x + dx, self.y):
-                self.x += dx
-                return True
-                
-        # Try to move vertically
-        if dy != 0:
-            if dungeon.is_walkable(self.x, self.y + dy):
-                self.y += dy
+        for step_x, step_y in steps:
+            if dungeon.is_walkable(x + step_x, y + step_y):
+                dungeon.move_entity(self, x + step_x, y + step_y)
                 return True
                 
         return False 
\ No newline at end of file
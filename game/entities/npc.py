@@ -1,151 +1,466 @@
 import random
+import json
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
 from game.entities.entity import Entity
-import portkey
+from game.world.dungeon import ADJACENT_OFFSETS
 
+# Responses already generated, keyed by a hash of the full prompt. The prompt captures the
+# character, conversation history and query, so a match can be replayed as-is.
+# Least recently used responses are dropped once the cache is full.
+RESPONSE_CACHE_SIZE = 512
+_response_cache = OrderedDict()
+_response_cache_lock = threading.Lock()  # Characters talk from the game's LLM worker threads
+_response_cache_dirty = False  # Set when the cache has responses that haven't been saved
+# Futures of the responses being generated, by cache key, so a prompt already
+# being answered (such as a greeting still prefetching) waits for that answer
+_in_flight = {}
 
-class NPC(Entity):
-    """Non-player character class."""
+
+def _portkey():
+    """Return the portkey module, importing it on first use since loading its SDK takes seconds."""
+    import portkey
+    return portkey
+
+
+def _prompt_key(prompt):
+    """Return the response cache key for a prompt."""
+    return hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+
+
+def _remember_response(key, response):
+    """Store a response in the cache, evicting the least recently used one if it is full."""
+    global _response_cache_dirty
+    with _response_cache_lock:
+        if _response_cache.get(key) != response:
+            _response_cache_dirty = True
+        _response_cache[key] = response
+        _response_cache.move_to_end(key)
+        if len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def load_response_cache(path):
+    """Fill the response cache from a file written by save_response_cache."""
+    with open(path, 'r') as f:
+        entries = json.load(f)
+        
+    with _response_cache_lock:
+        # Entries are stored least recently used first, so the newest survive if the cache is smaller
+        for key, response in entries.items():
+            key = bytes.fromhex(key)
+            _response_cache[key] = response
+            _response_cache.move_to_end(key)
+        while len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+def save_response_cache(path):
+    """
+    Write the response cache to a file if it has new responses since it was last saved.
+    Returns whether the file was written.
+    """
+    global _response_cache_dirty
+    with _response_cache_lock:
+        if not _response_cache_dirty:
+            return False
+        entries = {key.hex(): response for key, response in _response_cache.items()}
+        _response_cache_dirty = False
+        
+    try:
+        with open(path, 'w') as f:
+            json.dump(entries, f, indent=2)
+    except Exception:
+        _response_cache_dirty = True  # Try again on the next save
+        raise
+    return True
+
+
+# Summaries of old conversation history are generated here, in the background of the conversation
+_summary_pool = ThreadPoolExecutor(max_workers=2)
+# Guards conversation histories, which summaries are added to from the summary pool's threads.
+# Reentrant because a summary that is already done is added by the thread that trims the history.
+_history_lock = threading.RLock()
+# Summary failures, reported from the summary pool's threads and shown in the game log by the game
+_summary_errors = deque()
+
+
+def _start_summary(character, history_length):
+    """
+    Start summarizing the exchanges that trimming a history of the given length would replace.
+    Returns a future resolving to the summary, or None if no summary would be needed.
+    """
+    keep_count = int(character.max_history_length * 0.7)
+    if history_length <= character.max_history_length or history_length - keep_count <= 2:
+        return None
+    if character._summary_pending:
+        return None
+        
+    older_history = character.conversation_history[:history_length - keep_count]
+    return _summary_pool.submit(_portkey().claude37sonnet, character._build_summary_prompt(older_history))
+
+
+def cancel_summaries():
+    """Cancel the summaries that haven't started, e.g. when the game quits."""
+    _summary_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def pop_summary_errors():
+    """Return and forget the summary failures reported since the last call."""
+    errors = []
+    while _summary_errors:
+        errors.append(_summary_errors.popleft())
+    return errors
+
+
+def _prepend_summary(character, summary_future):
+    """Add a finished summary of older exchanges to the start of a character's history."""
+    try:
+        summary = summary_future.result()
+    except CancelledError:
+        # Cancelled by cancel_summaries(); the game is quitting
+        summary = None
+    except Exception as e:
+        # Not printed: this runs on a summary thread while curses owns the screen
+        _summary_errors.append(f"Error summarizing conversation with {character.name}: {e}")
+        summary = None
+        
+    with _history_lock:
+        if summary is not None:
+            character.conversation_history.insert(0, {"query": "*Earlier conversation*",
+                                                      "response": f"*Summary: {summary}*"})
+        character._summary_pending = False
+
+
+def _normalize_query(query):
+    """Reduce a player query to a form that ignores case, spacing and end punctuation."""
+    # Actions such as "*You approach the character*" are matched exactly
+    if query.startswith("*") and query.endswith("*"):
+        return query
+    return " ".join(query.casefold().split()).rstrip(" .!?")
+
+
+def _model_for_query(player_query):
+    """Pick the model for a query: Haiku for actions and short chit-chat, Sonnet otherwise."""
+    if (player_query.startswith("*") and player_query.endswith("*")) or len(player_query.split()) <= 3:
+        return "claude35haiku"
+    return "claude37sonnet"
+
+
+def _cached_response(prompt, key_prompt=None, model="claude37sonnet", on_partial=None,
+                     latency_optimized=False):
+    """
+    Return Claude's response to a prompt, only calling the API for new prompts;
+    a prompt that is already being answered on another thread waits for that answer.
+    If key_prompt is given, it is used to look up and store the response instead of prompt.
+    model names the portkey function to call. If on_partial is given, the response is
+    streamed and on_partial is called with the text received so far each time it grows.
+    latency_optimized asks for latency-optimized inference where the provider offers it.
+    """
+    key = _prompt_key(key_prompt if key_prompt is not None else prompt)
+    with _response_cache_lock:
+        response = _response_cache.get(key)
+        if response is not None:
+            _response_cache.move_to_end(key)
+            return response
+        pending = _in_flight.get(key)
+        if pending is None:
+            _in_flight[key] = future = Future()
+            
+    if pending is not None:
+        return pending.result()
+        
+    # The API call happens outside the lock so other characters aren't held up
+    try:
+        if on_partial is None:
+            response = getattr(_portkey(), model)(prompt, latency_optimized)
+        else:
+            pieces = []
+            for piece in getattr(_portkey(), model + "_stream")(prompt, latency_optimized):
+                pieces.append(piece)
+                on_partial("".join(pieces))
+            response = "".join(pieces)
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    else:
+        _remember_response(key, response)
+        future.set_result(response)
+    finally:
+        with _response_cache_lock:
+            del _in_flight[key]
+    return response
+
+
+# Most characters of conversation history sent with a query, roughly 800 tokens at ~4 characters each
+HISTORY_CHAR_BUDGET = 3200
+
+
+def _history_lines(conversation_history):
+    """Format the most recent exchanges (up to 5) that fit in the history budget, oldest first."""
+    lines = []
+    used = 0
+    for exchange in reversed(conversation_history[-5:]):
+        line = f"Player: {exchange['query']}\nYou: {exchange['response']}\n\n"
+        used += len(line)
+        # The latest exchange is always kept so the character knows what was just said
+        if lines and used > HISTORY_CHAR_BUDGET:
+            break
+        lines.append(line)
+    lines.reverse()
+    return lines
+
+
+# The fixed parts of the character prompts, placed between the per-character and per-turn parts
+_NPC_GREETING_NOTE = "The player has just approached you, so greet them appropriately based on your personality."
+_NPC_INSTRUCTIONS = """
+
+Respond to the player's query in character, using first person perspective. 
+Keep your response concise (1-3 sentences). Stay in character at all times.
+Don't use any markers like "Character:" or quotation marks in your response.
+Your personality should strongly influence how you respond.
+Maintain continuity with the previous conversation if applicable.
+
+Conversation history:
+"""
+
+_ENEMY_GAME_CONTEXT = """
+Game context:
+You are an enemy in a dungeon. The player character is an adventurer who has encountered you.
+"""
+_ENEMY_GREETING_NOTE = ("The player has just approached you. "
+                        "Respond with hostility, threats, or curiosity depending on your personality.")
+_ENEMY_INSTRUCTIONS = """
+
+Respond to the player's query in character, using first person perspective. 
+Keep your response concise (1-3 sentences). Stay in character at all times.
+Don't use any markers like "Character:" or quotation marks in your response.
+Your personality and behavior should strongly influence how you respond.
+Be hostile, threatening, or aggressive, but you might also be curious about the player.
+Maintain continuity with the previous conversation if applicable.
+
+Conversation history:
+"""
+
+
+class ChattyEntity(Entity):
+    """Base class for characters the player can hold an LLM-driven conversation with."""
     
-    def __init__(self, name, x=0, y=0, personality=None, dialogue=None, description=None, 
-                 max_history_length=10):
+    __slots__ = ("personality", "description", "_prompt_prefix", "move_cooldown", "move_cooldown_max",
+                 "conversation_history", "_summary_pending", "max_history_length")
+    
+    # Set by subclasses
+    greeting_query = None  # The query sent when the player first approaches
+    conversation_contexts = ()  # Context lines for a first, brief and ongoing conversation
+    summary_role = None  # How the summary prompt refers to the character
+    summary_speaker = None  # Label of the character's lines in the summary prompt
+    game_context = ""  # Game context placed after the character details, if _prompt_prefix lacks it
+    greeting_note = ""  # How to react when the player first approaches
+    instructions = ""  # How to respond, placed right before the conversation history
+    
+    def __init__(self, name, x, y, char, color_pair, entity_type, personality, description,
+                 max_history_length):
         super().__init__(
             name=name,
-            char="N",
-            color_pair=5,  # Blue
+            char=char,
+            color_pair=color_pair,
             x=x,
             y=y,
             blocks_movement=True,
-            entity_type="npc"
+            entity_type=entity_type
         )
-        self.personality = personality or "Neutral"
-        self.dialogue = dialogue or ["Hello, adventurer."]
-        self.description = description or "A mysterious figure."
-        self.current_dialogue_index = 0
+        self.personality = personality
+        self.description = description
         self.move_cooldown = 0
-        self.move_cooldown_max = 5
         # Add conversation memory with configurable length
         self.conversation_history = []
+        self._summary_pending = False  # Set while older exchanges are being summarized
         self.max_history_length = max_history_length
         
-    def talk(self, player_query=None):
+    def talk(self, player_query=None, on_partial=None):
         """
         Return dialogue line.
-        If player_query is provided, generate a response using Claude 3.7 Sonnet.
-        Otherwise, return the next predefined dialogue line.
+        If player_query is provided, generate a response using Claude (Haiku or Sonnet).
+        on_partial, if given, is called with the reply so far while it is streamed in.
+        Otherwise, return the character's scripted line.
         """
         if player_query is None:
-            # No query provided, use predefined dialogue
-            if not self.dialogue:
-                return "..."
-                
-            line = self.dialogue[self.current_dialogue_index]
-            self.current_dialogue_index = (self.current_dialogue_index + 1) % len(self.dialogue)
-            return line
-        else:
-            # Use Claude 3.7 Sonnet to generate a response
-            prompt = self._build_npc_prompt(player_query)
-            response = portkey.claude37sonnet(prompt)
+            return self._scripted_line()
             
+        # Use Claude to generate a response (Haiku for short queries, Sonnet otherwise)
+        prompt = self._build_prompt(player_query)
+        # Queries that only differ in case, spacing or end punctuation share a reply;
+        # an already normalized query (such as an action) can reuse the prompt as its key
+        normalized_query = _normalize_query(player_query)
+        key_prompt = prompt if normalized_query == player_query else self._build_prompt(normalized_query)
+        
+        # If this exchange pushes the history past its limit, the older exchanges are
+        # summarized while the response is generated rather than after it
+        summary_future = _start_summary(self, len(self.conversation_history) + 1)
+        # The player is waiting on this reply, unlike summaries and prefetched greetings
+        try:
+            response = _cached_response(prompt, key_prompt, _model_for_query(player_query), on_partial,
+                                        latency_optimized=True)
+        except Exception:
+            # Nothing is added to the history, so the summary isn't needed yet
+            if summary_future is not None:
+                summary_future.cancel()
+            raise
+
+        with _history_lock:
             # Add to conversation history
             self.conversation_history.append({"query": player_query, "response": response})
             
             # Trim history if it gets too long
             if len(self.conversation_history) > self.max_history_length:
-                self._trim_conversation_history()
-                
-            return response
+                self._trim_conversation_history(summary_future)
+            
+        return response
     
-    def _build_npc_prompt(self, player_query):
-        """Build a prompt for Claude based on NPC personality and conversation history."""
-        is_initial_greeting = player_query == "*You approach the character*"
+    def _scripted_line(self):
+        """Return the line spoken without a player query - to be overridden by subclasses."""
+        return "..."
+        
+    def prefetch_greeting(self):
+        """Put this character's initial greeting in the response cache ahead of time and return it."""
+        # The greeting prompt only depends on the character while the history is empty
+        query = self.greeting_query
+        return _cached_response(self._build_prompt(query), model=_model_for_query(query))
+    
+    def _build_prompt(self, player_query):
+        """Build a prompt for Claude based on the character's personality and conversation history."""
+        is_initial_greeting = player_query == self.greeting_query
         
         # Determine conversation context based on history length
+        first, brief, ongoing = self.conversation_contexts
         if len(self.conversation_history) == 0:
-            conversation_context = "This is your first interaction with the player."
+            conversation_context = first
         elif len(self.conversation_history) < 3:
-            conversation_context = "You've had a brief conversation with the player already."
+            conversation_context = brief
         else:
-            conversation_context = "You've been having an ongoing conversation with the player."
-        
-        prompt = f"""
-You are roleplaying as {self.name}, a character in a fantasy roguelike dungeon game.
-
-Character details:
-- Name: {self.name}
-- Personality: {self.personality}
-- Description: {self.description}
-
-Game context:
-You are a character in a dungeon. The player character is an adventurer exploring this dungeon.
-{conversation_context}
-{'' if not is_initial_greeting else 'The player has just approached you, so greet them appropriately based on your personality.'}
-
-Respond to the player's query in character, using first person perspective. 
-Keep your response concise (1-3 sentences). Stay in character at all times.
-Don't use any markers like "Character:" or quotation marks in your response.
-Your personality should strongly influence how you respond.
-Maintain continuity with the previous conversation if applicable.
-
-Conversation history:
-"""
+            conversation_context = ongoing
         
-        # Add conversation history if it exists
-        history_to_include = min(len(self.conversation_history), 5)  # Include up to 5 previous exchanges
+        parts = self._prompt_head(conversation_context, is_initial_greeting)
         
-        if self.conversation_history:
-            for exchange in self.conversation_history[-history_to_include:]:
-                prompt += f"Player: {exchange['query']}\n"
-                prompt += f"You: {exchange['response']}\n\n"
+        # Add conversation history if it exists (up to 5 previous exchanges, within the budget)
+        parts.extend(_history_lines(self.conversation_history))
         
         # Add the current query, but handle initial greeting differently
         if is_initial_greeting:
-            prompt += "Player has just approached you.\n"
-            prompt += "You: "
+            parts.append("Player has just approached you.\nYou: ")
         else:
-            prompt += f"Player: {player_query}\n"
-            prompt += "You: "
+            parts.append(f"Player: {player_query}\nYou: ")
+        
+        return "".join(parts)
+        
+    def _prompt_head(self, conversation_context, is_initial_greeting):
+        """Return the prompt parts before the conversation history."""
+        return [self._prompt_prefix, self._prompt_stats(), self.game_context, conversation_context, "\n",
+                self.greeting_note if is_initial_greeting else "", self.instructions]
+        
+    def _prompt_stats(self):
+        """Return the prompt lines of character details that change during the game (none by default)."""
+        return ""
         
-        return prompt
+    def _build_summary_prompt(self, older_history):
+        """Build a prompt asking Claude to summarize earlier conversation exchanges."""
+        summary_prompt = f"""
+You are an AI assistant helping to summarize parts of a conversation between a player and 
+{self.summary_role} named {self.name} in a fantasy roguelike game.
+
+Below are {len(older_history)} conversation exchanges that happened earlier in their conversation.
+Please create a very concise summary (max 3 sentences) that captures the key points discussed.
+
+Conversation to summarize:
+"""
+        for exchange in older_history:
+            summary_prompt += f"Player: {exchange['query']}\n"
+            summary_prompt += f"{self.summary_speaker}: {exchange['response']}\n\n"
+            
+        return summary_prompt
         
-    def _trim_conversation_history(self):
+    def _trim_conversation_history(self, summary_future=None):
         """
         Trim conversation history when it exceeds the maximum length.
-        Keep the most recent exchanges and summarize older ones.
+        Keep the most recent exchanges and summarize older ones in the background;
+        the summary is added to the start of the history when it is ready.
+        summary_future is an already started summary of the older exchanges, if any.
         """
         if len(self.conversation_history) <= self.max_history_length:
             return
             
-        # Keep the most recent conversations (roughly 70% of max)
+        # Keep the most recent conversations (roughly 70% of max), dropping the rest in place
         keep_count = int(self.max_history_length * 0.7)
-        history_to_keep = self.conversation_history[-keep_count:]
+        drop_count = len(self.conversation_history) - keep_count
+        older_history = self.conversation_history[:drop_count]
+        del self.conversation_history[:drop_count]
         
-        # Summarize the older conversations if there are enough to summarize
-        if len(self.conversation_history) - keep_count > 2:
-            older_history = self.conversation_history[:(len(self.conversation_history) - keep_count)]
-            
-            # Create a summary of older conversations
-            summary_prompt = f"""
-You are an AI assistant helping to summarize parts of a conversation between a player and 
-an NPC named {self.name} in a fantasy roguelike game.
+        # Summarize the older conversations if there are enough to summarize meaningfully,
+        # unless an earlier summary is still being generated
+        if len(older_history) > 2 and (summary_future is not None or not self._summary_pending):
+            if summary_future is None:
+                summary_future = _summary_pool.submit(_portkey().claude37sonnet,
+                                                      self._build_summary_prompt(older_history))
+            self._summary_pending = True
+            summary_future.add_done_callback(lambda future: _prepend_summary(self, future))
 
-Below are {len(older_history)} conversation exchanges that happened earlier in their conversation.
-Please create a very concise summary (max 3 sentences) that captures the key points discussed.
 
-Conversation to summarize:
+class NPC(ChattyEntity):
+    """Non-player character class."""
+    
+    __slots__ = ("dialogue", "current_dialogue_index")
+    
+    greeting_query = "*You approach the character*"
+    conversation_contexts = (
+        "This is your first interaction with the player.",
+        "You've had a brief conversation with the player already.",
+        "You've been having an ongoing conversation with the player.",
+    )
+    summary_role = "an NPC"
+    summary_speaker = "NPC"
+    greeting_note = _NPC_GREETING_NOTE
+    instructions = _NPC_INSTRUCTIONS
+    
+    def __init__(self, name, x=0, y=0, personality=None, dialogue=None, description=None, 
+                 max_history_length=10):
+        super().__init__(
+            name=name,
+            x=x,
+            y=y,
+            char="N",
+            color_pair=5,  # Blue
+            entity_type="npc",
+            personality=personality or "Neutral",
+            description=description or "A mysterious figure.",
+            max_history_length=max_history_length
+        )
+        self.dialogue = dialogue or ["Hello, adventurer."]
+        # The character block at the start of every prompt never changes, so build it once
+        self._prompt_prefix = f"""
+You are roleplaying as {self.name}, a character in a fantasy roguelike dungeon game.
+
+Character details:
+- Name: {self.name}
+- Personality: {self.personality}
+- Description: {self.description}
+
+Game context:
+You are a character in a dungeon. The player character is an adventurer exploring this dungeon.
 """
-            for exchange in older_history:
-                summary_prompt += f"Player: {exchange['query']}\n"
-                summary_prompt += f"NPC: {exchange['response']}\n\n"
-                
-            summary = portkey.claude37sonnet(summary_prompt)
-            
-            # Add the summary as the first item in the conversation history
-            self.conversation_history = [{"query": "*Earlier conversation*", 
-                                         "response": f"*Summary: {summary}*"}] + history_to_keep
-        else:
-            # If there aren't enough older messages to summarize meaningfully, just keep the recent ones
-            self.conversation_history = history_to_keep
+        self.current_dialogue_index = 0
+        self.move_cooldown_max = 5
         
+    def _scripted_line(self):
+        """Return the next predefined dialogue line."""
+        if not self.dialogue:
+            return "..."
+            
+        line = self.dialogue[self.current_dialogue_index]
+        self.current_dialogue_index = (self.current_dialogue_index + 1) % len(self.dialogue)
+        return line
+    
     def update(self, player):
         """Update NPC behavior."""
         # Occasionally move randomly
@@ -154,84 +469,57 @@ Conversation to summarize:
             # Reset cooldown
             self.move_cooldown = self.move_cooldown_max
             
-            # Random movement
-            dx = random.choice([-1, 0, 1])
-            dy = random.choice([-1, 0, 1])
+            # Random movement: one pick among the current tile and its eight neighbours
+            dx, dy = random.choice(ADJACENT_OFFSETS)
             
-            # Get the dungeon from the entity's position
-            dungeon = player.dungeon if hasattr(player, "dungeon") else None
+            # The dungeon the NPC was added to
+            dungeon = self.dungeon
             
             if dungeon:
                 new_x = self.x + dx
                 new_y = self.y + dy
                 
-                if dungeon.is_walkable(new_x, new_y):
-                    self.x = new_x
-                    self.y = new_y
+                # The player isn't in the dungeon's entity index, so keep off its tile explicitly
+                if (new_x != player.x or new_y != player.y) and dungeon.is_walkable(new_x, new_y):
+                    dungeon.move_entity(self, new_x, new_y)
 
 
-class Enemy(Entity):
+class Enemy(ChattyEntity):
     """Enemy character class."""
     
+    __slots__ = ("hp", "max_hp", "attack", "behavior", "detection_range", "detection_range_sq")
+    
+    greeting_query = "*You approach the enemy*"
+    conversation_contexts = (
+        "This is your first interaction with the player.",
+        "You've had a brief exchange with the player already.",
+        "You've been interacting with the player for some time.",
+    )
+    summary_role = "an enemy"
+    summary_speaker = "Enemy"
+    game_context = _ENEMY_GAME_CONTEXT
+    greeting_note = _ENEMY_GREETING_NOTE
+    instructions = _ENEMY_INSTRUCTIONS
+    
     def __init__(self, name, x=0, y=0, hp=20, attack=5, behavior=None, personality=None, description=None,
                  max_history_length=10):
         super().__init__(
             name=name,
-            char="E",
-            color_pair=3,  # Red
             x=x,
             y=y,
-            blocks_movement=True,
-            entity_type="enemy"
+            char="E",
+            color_pair=3,  # Red
+            entity_type="enemy",
+            personality=personality or "Hostile",
+            description=description or "A menacing creature.",
+            max_history_length=max_history_length
         )
         self.hp = hp
         self.max_hp = hp
         self.attack = attack
         self.behavior = behavior or "aggressive"
-        self.personality = personality or "Hostile"
-        self.description = description or "A menacing creature."
-        self.move_cooldown = 0
-        self.move_cooldown_max = 3
-        self.detection_range = 8
-        # Add conversation memory with configurable length
-        self.conversation_history = []
-        self.max_history_length = max_history_length
-        
-    def talk(self, player_query=None):
-        """
-        Return dialogue line from the enemy.
-        If player_query is provided, generate a response using Claude 3.7 Sonnet.
-        """
-        if player_query is None:
-            # Default aggressive response if no query provided
-            return "The enemy growls menacingly."
-        else:
-            # Use Claude 3.7 Sonnet to generate a response
-            prompt = self._build_enemy_prompt(player_query)
-            response = portkey.claude37sonnet(prompt)
-            
-            # Add to conversation history
-            self.conversation_history.append({"query": player_query, "response": response})
-            
-            # Trim history if it gets too long
-            if len(self.conversation_history) > self.max_history_length:
-                self._trim_conversation_history()
-                
-            return response
-    
-    def _build_enemy_prompt(self, player_query):
-        """Build a prompt for Claude based on enemy personality and conversation history."""
-        is_initial_greeting = player_query == "*You approach the enemy*"
-        
-        # Determine conversation context based on history length
-        if len(self.conversation_history) == 0:
-            conversation_context = "This is your first interaction with the player."
-        elif len(self.conversation_history) < 3:
-            conversation_context = "You've had a brief exchange with the player already."
-        else:
-            conversation_context = "You've been interacting with the player for some time."
-        
-        prompt = f"""
+        # The character block at the start of every prompt, built once (HP changes, so it stays out)
+        self._prompt_prefix = f"""
 You are roleplaying as {self.name}, a hostile enemy creature in a fantasy roguelike dungeon game.
 
 Character details:
@@ -239,79 +527,18 @@ Character details:
 - Personality: {self.personality}
 - Behavior: {self.behavior}
 - Description: {self.description}
-- HP: {self.hp}/{self.max_hp}
-
-Game context:
-You are an enemy in a dungeon. The player character is an adventurer who has encountered you.
-{conversation_context}
-{'' if not is_initial_greeting else 'The player has just approached you. Respond with hostility, threats, or curiosity depending on your personality.'}
-
-Respond to the player's query in character, using first person perspective. 
-Keep your response concise (1-3 sentences). Stay in character at all times.
-Don't use any markers like "Character:" or quotation marks in your response.
-Your personality and behavior should strongly influence how you respond.
-Be hostile, threatening, or aggressive, but you might also be curious about the player.
-Maintain continuity with the previous conversation if applicable.
-
-Conversation history:
 """
+        self.move_cooldown_max = 3
+        self.detection_range = 8
+        self.detection_range_sq = self.detection_range ** 2  # Compared against squared distances
         
-        # Add conversation history if it exists
-        history_to_include = min(len(self.conversation_history), 5)  # Include up to 5 previous exchanges
-        
-        if self.conversation_history:
-            for exchange in self.conversation_history[-history_to_include:]:
-                prompt += f"Player: {exchange['query']}\n"
-                prompt += f"You: {exchange['response']}\n\n"
-        
-        # Add the current query, but handle initial greeting differently
-        if is_initial_greeting:
-            prompt += "Player has just approached you.\n"
-            prompt += "You: "
-        else:
-            prompt += f"Player: {player_query}\n"
-            prompt += "You: "
-        
-        return prompt
-        
-    def _trim_conversation_history(self):
-        """
-        Trim conversation history when it exceeds the maximum length.
-        Keep the most recent exchanges and summarize older ones.
-        """
-        if len(self.conversation_history) <= self.max_history_length:
-            return
-            
-        # Keep the most recent conversations (roughly 70% of max)
-        keep_count = int(self.max_history_length * 0.7)
-        history_to_keep = self.conversation_history[-keep_count:]
-        
-        # Summarize the older conversations if there are enough to summarize
-        if len(self.conversation_history) - keep_count > 2:
-            older_history = self.conversation_history[:(len(self.conversation_history) - keep_count)]
-            
-            # Create a summary of older conversations
-            summary_prompt = f"""
-You are an AI assistant helping to summarize parts of a conversation between a player and 
-an enemy named {self.name} in a fantasy roguelike game.
-
-Below are {len(older_history)} conversation exchanges that happened earlier in their conversation.
-Please create a very concise summary (max 3 sentences) that captures the key points discussed.
-
-Conversation to summarize:
-"""
-            for exchange in older_history:
-                summary_prompt += f"Player: {exchange['query']}\n"
-                summary_prompt += f"Enemy: {exchange['response']}\n\n"
-                
-            summary = portkey.claude37sonnet(summary_prompt)
-            
-            # Add the summary as the first item in the conversation history
-            self.conversation_history = [{"query": "*Earlier conversation*", 
-                                         "response": f"*Summary: {summary}*"}] + history_to_keep
-        else:
-            # If there aren't enough older messages to summarize meaningfully, just keep the recent ones
-            self.conversation_history = history_to_keep
+    def _scripted_line(self):
+        """Return the default aggressive response."""
+        return "The enemy growls menacingly."
+    
+    def _prompt_stats(self):
+        """Return the enemy's current HP for the prompt."""
+        return f"- HP: {self.hp}/{self.max_hp}\n"
     
     def update(self, player):
         """Update enemy behavior."""
@@ -320,25 +547,24 @@ Conversation to summarize:
         if self.move_cooldown <= 0:
             self.move_cooldown = self.move_cooldown_max
             
-            # Get distance to player
-            distance = self.distance_to(player)
+            # Get squared distance to player (no square root needed to compare)
+            distance_sq = self.distance_sq_to(player)
+            
+            # The dungeon the enemy was added to
+            dungeon = self.dungeon
             
             # If player is within detection range and visible
-            if distance < self.detection_range:
-                # Move towards player
-                dungeon = player.dungeon if hasattr(player, "dungeon") else None
-                if dungeon:
+            if distance_sq < self.detection_range_sq:
+                # Move towards player, stopping once adjacent so it never steps onto the player
+                if dungeon and distance_sq > 2:
                     self.move_towards(player.x, player.y, dungeon)
             else:
-                # Random movement
-                dx = random.choice([-1, 0, 1])
-                dy = random.choice([-1, 0, 1])
+                # Random movement: one pick among the current tile and its eight neighbours
+                dx, dy = random.choice(ADJACENT_OFFSETS)
                 
-                dungeon = player.dungeon if hasattr(player, "dungeon") else None
                 if dungeon:
                     new_x = self.x + dx
                     new_y = self.y + dy
                     
                     if dungeon.is_walkable(new_x, new_y):
-                        self.x = new_x
-                        self.y = new_y 
\ No newline at end of file
+                        dungeon.move_entity(self, new_x, new_y)
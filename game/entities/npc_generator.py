@@ -1,15 +1,48 @@
 import random
 import json
-import sys
 import os
-import pickle
+import uuid
+import queue
+import atexit
+import itertools
+import threading
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-# Add the project root to the Python path
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+from game.entities.npc import NPC, Enemy, load_response_cache, save_response_cache
 
-from portkey import claude37sonnet
-from game.entities.npc import NPC, Enemy
+# Most characters generated at the same time; each one is a separate LLM call
+GENERATION_WORKERS = 8
+
+# Times a character is asked for before falling back to a default one
+GENERATION_ATTEMPTS = 2
+
+# Decodes the JSON object embedded in an LLM response in place, without slicing it out first
+_json_decoder = json.JSONDecoder()
+
+# Earlier characters a level needs before any of them are reused instead of generating new ones
+REUSE_POOL_SIZE = 5
+
+# Dialogue of the fallback NPC; a tuple, so every fallback NPC can share it
+_DEFAULT_NPC_DIALOGUE = (
+    "Welcome, traveler.",
+    "These dungeons hold many secrets.",
+    "Be careful as you venture deeper."
+)
+
+# Fields a generated character must have, with their types; responses missing any are rejected
+NPC_FIELDS = {"name": str, "personality": str, "dialogue": list}
+ENEMY_FIELDS = {"name": str, "hp": int, "attack": int, "behavior": str}
+
+
+def _check_fields(character_data: dict, fields: dict):
+    """Raise ValueError if the character data is missing a required field or has one of the wrong type."""
+    for field, field_type in fields.items():
+        value = character_data.get(field)
+        # Empty values are rejected too; bool is a subclass of int, but true/false is no stat
+        if not value or not isinstance(value, field_type) or isinstance(value, bool):
+            raise ValueError(f"generated character has no valid {field!r}: {value!r}")
 
 # Templates for NPC/enemy generation
 NPC_PROMPT_TEMPLATE = """
@@ -115,21 +148,48 @@ Make the enemy genuinely intellectual rather than simply pretentious - they shou
 """
 
 
+def _split_template(template: str):
+    """Split a prompt template into the text before and after {level}, with its braces unescaped."""
+    before, after = template.split("{level}")
+    return before.format(), after.format()
+
+
+# The templates split once at import, so a prompt is built by concatenation instead of format()
+_NPC_PROMPT = _split_template(NPC_PROMPT_TEMPLATE)
+_ENEMY_PROMPT = _split_template(ENEMY_PROMPT_TEMPLATE)
+_PHILOSOPHICAL_NPC_PROMPT = _split_template(PHILOSOPHICAL_NPC_PROMPT_TEMPLATE)
+_PHILOSOPHICAL_ENEMY_PROMPT = _split_template(PHILOSOPHICAL_ENEMY_PROMPT_TEMPLATE)
+
+
 class NPCGenerator:
     """Generates NPCs and enemies using LLMs."""
     
-    def __init__(self, use_pregenerated=False, save_generated=True, philosophical_mode=False):
+    def __init__(self, use_pregenerated=False, save_generated=True, philosophical_mode=False,
+                 reuse_probability=0.0):
         # Cache generated NPCs/enemies to avoid redundant API calls during testing
         self.npc_cache = {}
         self.enemy_cache = {}
+        # Cache keys of characters generated since the last save
+        self._dirty_npcs = set()
+        self._dirty_enemies = set()
+        # New cache keys end in this session's id and a running number, so they never collide
+        # with each other or with the keys saved by earlier sessions
+        self._session_id = uuid.uuid4().hex[:8]
+        self._key_counter = itertools.count(1)
         self.use_pregenerated = use_pregenerated
         self.save_generated = save_generated
         self.philosophical_mode = philosophical_mode
+        # Stored with every generated character, so each mode only uses its own saved characters
+        self._mode = "philosophical" if philosophical_mode else "normal"
+        # Chance of reusing an earlier character for a level instead of generating a new one
+        self.reuse_probability = reuse_probability
         
         # Paths for saved characters
         self.data_dir = Path(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../game/data')))
-        self.npc_file = self.data_dir / 'npcs.json'
-        self.enemy_file = self.data_dir / 'enemies.json'
+        # One JSON record per line; new characters are appended instead of rewriting the files
+        self.npc_file = self.data_dir / 'npcs.jsonl'
+        self.enemy_file = self.data_dir / 'enemies.jsonl'
+        self.response_file = self.data_dir / 'responses.json'
         
         # Ensure data directory exists
         self.data_dir.mkdir(parents=True, exist_ok=True)
@@ -137,18 +197,49 @@ class NPCGenerator:
         # Pre-generated character storage
         self.pregenerated_npcs = {}
         self.pregenerated_enemies = {}
+        # Character data by ("npc" or "enemy", mode, level): loaded from the files, and generated this session
+        self._pregenerated_by_level = {}
+        self._generated_by_level = {}
         
-        # Load pre-generated characters if option is enabled
-        if self.use_pregenerated:
+        # Saves are written by a background thread so the game never waits on the disk;
+        # whatever is still queued when the game exits is written before the process ends
+        self._save_requests = queue.Queue()
+        threading.Thread(target=self._save_worker, daemon=True).start()
+        atexit.register(self._save_requests.join)
+        # Failures of saves and of generation, which both run in the background during play;
+        # the game shows them in its log, since printing while curses owns the screen would draw over the map
+        self._errors = deque()
+        
+        # Characters of the next level, generated in the background by warm_up():
+        # ((level, num_npcs, num_enemies), Future of (npcs, enemies), Event set to discard them), or None
+        self._warm_up_pool = ThreadPoolExecutor(max_workers=1)
+        self._warm_up = None
+        # Greetings are prefetched here rather than on the game's pool, which is kept for replies
+        # the player is waiting on
+        self._greeting_pool = ThreadPoolExecutor(max_workers=1)
+        # Pools of the batches and greetings being generated, so close() can cancel their queued calls
+        self._pools = set()
+        self._closed = False
+        
+        # Load pre-generated characters if option is enabled (reuse draws on them too)
+        if self.use_pregenerated or self.reuse_probability > 0:
             self.load_pregenerated_characters()
+            
+        # Saving rewrites the whole response file, so it is loaded first whenever saving is on
+        # to keep the responses of earlier sessions
+        if self.use_pregenerated or self.reuse_probability > 0 or self.save_generated:
+            self._load_saved_responses()
     
     def load_pregenerated_characters(self):
         """Load pre-generated NPCs and enemies from files."""
+        # Characters saved before the JSON Lines files were added are moved into them first
+        self._import_legacy_file(self.data_dir / 'npcs.json', self.npc_file)
+        self._import_legacy_file(self.data_dir / 'enemies.json', self.enemy_file)
+        
         # Load NPCs
         if self.npc_file.exists():
             try:
-                with open(self.npc_file, 'r') as f:
-                    self.pregenerated_npcs = json.load(f)
+                self.pregenerated_npcs = self._read_character_file(self.npc_file)
                 print(f"Loaded {len(self.pregenerated_npcs)} pre-generated NPCs.")
             except Exception as e:
                 print(f"Error loading pre-generated NPCs: {e}")
@@ -157,78 +248,333 @@ class NPCGenerator:
         # Load enemies
         if self.enemy_file.exists():
             try:
-                with open(self.enemy_file, 'r') as f:
-                    self.pregenerated_enemies = json.load(f)
+                self.pregenerated_enemies = self._read_character_file(self.enemy_file)
                 print(f"Loaded {len(self.pregenerated_enemies)} pre-generated enemies.")
             except Exception as e:
                 print(f"Error loading pre-generated enemies: {e}")
                 self.pregenerated_enemies = {}
+        
+        # Index the characters by level once, instead of scanning every key on each spawn
+        self._pregenerated_by_level = {}
+        for kind, characters in (("npc", self.pregenerated_npcs), ("enemy", self.pregenerated_enemies)):
+            for key, character_data in characters.items():
+                # Keys look like "npc_level_3_..."; characters saved before modes were recorded are normal
+                parts = key.split("_")
+                if len(parts) > 2 and parts[2].isdigit():
+                    index_key = (kind, character_data.get("mode", "normal"), int(parts[2]))
+                    self._pregenerated_by_level.setdefault(index_key, []).append(character_data)
+    
+    def _load_saved_responses(self):
+        """Load dialogue responses from earlier sessions into the response cache."""
+        # Replayed conversations (including the greetings of reused characters) are then instant
+        if self.response_file.exists():
+            try:
+                load_response_cache(self.response_file)
+            except Exception as e:
+                print(f"Error loading dialogue responses: {e}")
+    
+    def _import_legacy_file(self, legacy_path, path):
+        """
+        Append the characters of an old JSON file ({key: character_data}) to its JSONL file,
+        then rename the old file so it is only imported once.
+        """
+        if not legacy_path.exists():
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                legacy = json.load(f)
+            existing = self._read_character_file(path) if path.exists() else {}
+            new_keys = [key for key in legacy if key not in existing]
+            self._append_characters(path, legacy, new_keys)
+            legacy_path.rename(legacy_path.with_name(legacy_path.name + '.imported'))
+            print(f"Imported {len(new_keys)} characters from {legacy_path} into {path}.")
+        except Exception as e:
+            print(f"Error importing {legacy_path}: {e}")
+    
+    def _read_character_file(self, path):
+        """Read the characters in a JSONL file, where each line is {"key": ..., **character_data}."""
+        characters = {}
+        with open(path, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Skip blank lines and a line cut short by an interrupted save
+                    continue
+                characters[record.pop("key")] = record
+        return characters
+    
+    def _append_characters(self, path, cache, keys):
+        """Append the characters with the given cache keys to a JSONL file."""
+        with open(path, 'a') as f:
+            for key in keys:
+                f.write(json.dumps({"key": key, **cache[key]}, separators=(',', ':')) + "\n")
+    
+    def save_characters(self, wait=False):
+        """
+        Save generated NPCs and enemies to files on the background save thread.
+        If wait is set, only return once everything requested so far has been written.
+        """
+        self._save_requests.put(None)
+        if wait:
+            self.wait_for_saves()
+    
+    def wait_for_saves(self):
+        """Return once every save requested so far has been written."""
+        self._save_requests.join()
+    
+    def pop_errors(self):
+        """Return and forget the failures reported since the last call."""
+        errors = []
+        while self._errors:
+            errors.append(self._errors.popleft())
+        return errors
     
-    def save_characters(self):
-        """Save generated NPCs and enemies to files."""
+    def _save_worker(self):
+        """Write the requested saves one at a time, for as long as the game runs."""
+        while True:
+            self._save_requests.get()
+            try:
+                self._write_saved_data()
+            except Exception as e:
+                # Keep the thread running for later saves
+                self._errors.append(f"Error saving character data: {e}")
+            finally:
+                self._save_requests.task_done()
+    
+    def _write_saved_data(self):
+        """Write new characters and dialogue responses to their files."""
+        # Only characters generated since the last save are appended,
+        # so saving again (e.g. when quitting) is usually free.
+        # The keys are copied first; generation threads may add more while this runs.
+        
         # Save NPCs
-        if self.npc_cache:
+        dirty_npcs = list(self._dirty_npcs)
+        if dirty_npcs:
             try:
-                with open(self.npc_file, 'w') as f:
-                    json.dump(self.npc_cache, f, indent=2)
-                print(f"Saved {len(self.npc_cache)} NPCs to {self.npc_file}.")
+                self._append_characters(self.npc_file, self.npc_cache, dirty_npcs)
+                self._dirty_npcs.difference_update(dirty_npcs)
             except Exception as e:
-                print(f"Error saving NPCs: {e}")
+                self._errors.append(f"Error saving NPCs: {e}")
         
         # Save enemies
-        if self.enemy_cache:
+        dirty_enemies = list(self._dirty_enemies)
+        if dirty_enemies:
             try:
-                with open(self.enemy_file, 'w') as f:
-                    json.dump(self.enemy_cache, f, indent=2)
-                print(f"Saved {len(self.enemy_cache)} enemies to {self.enemy_file}.")
+                self._append_characters(self.enemy_file, self.enemy_cache, dirty_enemies)
+                self._dirty_enemies.difference_update(dirty_enemies)
             except Exception as e:
-                print(f"Error saving enemies: {e}")
+                self._errors.append(f"Error saving enemies: {e}")
+        
+        # Save dialogue responses (only written if new ones were generated)
+        try:
+            save_response_cache(self.response_file)
+        except Exception as e:
+            self._errors.append(f"Error saving dialogue responses: {e}")
+    
+    def prefetch_greetings(self, npcs):
+        """
+        Start generating the initial greeting of each NPC in the background,
+        so talking to them starts instantly. Returns a Future that is done once they all are.
+        """
+        return self._greeting_pool.submit(self._prefetch_greetings, npcs)
     
-    def generate_npc(self, level: int = 1) -> NPC:
-        """Generate an NPC using Claude 3.7 Sonnet or from pre-generated data."""
-        # Check if we should use pre-generated NPCs
+    def _prefetch_greetings(self, npcs):
+        """
+        Generate the initial greeting of each NPC.
+        Greetings are kept in the dialogue response cache, keyed on the NPC's whole greeting prompt,
+        so a greeting saved by an earlier session is restored without an API call.
+        """
+        if not npcs:
+            return
+            
+        # Request all the greetings at once so their round trips to the API overlap
+        # (a failed greeting is generated when the player first talks to the NPC instead)
+        pool = self._open_pool(len(npcs))
+        try:
+            for npc in npcs:
+                pool.submit(npc.prefetch_greeting)
+        finally:
+            self._finish_pool(pool)
+    
+    def generate_many(self, level: int, num_npcs: int, num_enemies: int):
+        """Generate several NPCs and enemies at once, making their LLM calls concurrently."""
+        # Use the characters warm_up() started generating, if it was asked for the same ones
+        warm_up = self._warm_up
+        if warm_up is not None and warm_up[0] == (level, num_npcs, num_enemies):
+            self._warm_up = None
+            return warm_up[1].result()
+        self._discard_warm_up()
+        return self._generate_batch(level, num_npcs, num_enemies)
+    
+    def warm_up(self, level: int, num_npcs: int, num_enemies: int):
+        """Start generating the characters of a level in the background, ahead of generate_many()."""
+        self._discard_warm_up()
+        discarded = threading.Event()
+        future = self._warm_up_pool.submit(self._generate_batch, level, num_npcs, num_enemies, discarded)
+        self._warm_up = ((level, num_npcs, num_enemies), future, discarded)
+    
+    def _discard_warm_up(self):
+        """Stop generating the characters of a warm_up() nobody is going to use."""
+        warm_up, self._warm_up = self._warm_up, None
+        if warm_up is not None:
+            warm_up[1].cancel()  # Only succeeds if the batch hasn't started
+            warm_up[2].set()  # Otherwise its characters that haven't started are skipped
+    
+    def close(self):
+        """
+        Stop all background generation, e.g. when the game quits.
+        Calls that haven't started are cancelled; ones already waiting on the API are left to finish.
+        """
+        self._closed = True
+        self._discard_warm_up()
+        self._warm_up_pool.shutdown(wait=False, cancel_futures=True)
+        self._greeting_pool.shutdown(wait=False, cancel_futures=True)
+        for pool in list(self._pools):
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _open_pool(self, max_workers: int) -> ThreadPoolExecutor:
+        """Create a thread pool for one batch of LLM calls that close() can cancel."""
+        pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._pools.add(pool)
+        return pool
+    
+    def _finish_pool(self, pool: ThreadPoolExecutor):
+        """Wait for the calls of a pool from _open_pool() to finish (or be cancelled)."""
+        pool.shutdown(wait=True)
+        self._pools.discard(pool)
+    
+    def _generate_batch(self, level: int, num_npcs: int, num_enemies: int, discarded=None):
+        """
+        Generate NPCs and enemies concurrently and save them together.
+        If the discarded event gets set, the characters not yet started are skipped.
+        """
+        discarded = discarded or threading.Event()
+        # The files are saved once at the end rather than after every character
+        pool = self._open_pool(GENERATION_WORKERS)
+        try:
+            npc_futures = [pool.submit(self._batch_character, self.generate_npc, level, discarded)
+                           for _ in range(num_npcs)]
+            enemy_futures = [pool.submit(self._batch_character, self.generate_enemy, level, discarded)
+                             for _ in range(num_enemies)]
+        finally:
+            self._finish_pool(pool)
+        # Characters skipped or cancelled by close() are left out
+        npcs = [f.result() for f in npc_futures if not f.cancelled() and f.result() is not None]
+        enemies = [f.result() for f in enemy_futures if not f.cancelled() and f.result() is not None]
+            
+        if self.save_generated:
+            self.save_characters()
+        return npcs, enemies
+    
+    def _batch_character(self, generate, level: int, discarded):
+        """Generate one character of a batch without saving it, or None if the batch is no longer wanted."""
+        if self._closed or discarded.is_set():
+            return None
+        return generate(level, False)
+    
+    def _reused_character_data(self, kind: str, level: int):
+        """Pick an earlier character to reuse for a level, or None to generate a new one."""
+        if self.reuse_probability <= 0 or random.random() >= self.reuse_probability:
+            return None
+            
+        # Saved characters and the ones generated so far this session
+        index_key = (kind, self._mode, level)
+        candidates = (self._pregenerated_by_level.get(index_key, []) +
+                      self._generated_by_level.get(index_key, []))
+        if len(candidates) < REUSE_POOL_SIZE:
+            return None
+        return random.choice(candidates)
+    
+    def _remember_generated(self, kind: str, level: int, character_data: dict):
+        """Make a character generated this session available for reuse."""
+        # setdefault and append are atomic, so generate_many's threads can share the index
+        self._generated_by_level.setdefault((kind, self._mode, level), []).append(character_data)
+    
+    def _new_cache_key(self, kind: str, level: int) -> str:
+        """Return a unique cache key for a newly generated character."""
+        return f"{kind}_level_{level}_{self._session_id}-{next(self._key_counter)}"
+    
+    def _character_data(self, kind: str, level: int, prompt_parts: tuple, fields: dict,
+                        cache: dict, dirty_keys: set, save: bool) -> dict:
+        """Return the data of a pre-generated, reused or newly generated character of a kind ("npc" or "enemy")."""
+        # Check if we should use pre-generated characters
         if self.use_pregenerated:
-            level_key = f"npc_level_{level}"
-            # Find NPCs for this level
-            level_npcs = [k for k in self.pregenerated_npcs.keys() if k.startswith(level_key)]
-            if level_npcs:
-                # Randomly choose one of the pre-generated NPCs
-                cache_key = random.choice(level_npcs)
-                npc_data = self.pregenerated_npcs[cache_key]
-                return self._create_npc_from_data(npc_data, level)
+            # Find characters for this level, generated in the same mode
+            level_characters = self._pregenerated_by_level.get((kind, self._mode, level))
+            if level_characters:
+                # Randomly choose one of the pre-generated characters
+                return random.choice(level_characters)
         
-        # Generate a new NPC
-        # Check cache first
-        cache_key = f"npc_level_{level}_{random.randint(1, 10000)}"
-        if cache_key in self.npc_cache:
-            npc_data = self.npc_cache[cache_key]
-        else:
-            # Generate NPC using LLM with the appropriate template
-            if self.philosophical_mode:
-                prompt = PHILOSOPHICAL_NPC_PROMPT_TEMPLATE.format(level=level)
-            else:
-                prompt = NPC_PROMPT_TEMPLATE.format(level=level)
-                
+        # Generate a new character, unless an earlier one is reused
+        character_data = self._reused_character_data(kind, level)
+        if character_data is not None:
+            return character_data
+            
+        cache_key = self._new_cache_key(kind, level)
+        # portkey is imported on first use, loading its SDK takes seconds
+        from portkey import claude37sonnet
+        before_level, after_level = prompt_parts
+        prompt = before_level + str(level) + after_level
+        # The API client already retries rate limits, server errors and timeouts with backoff;
+        # a response that isn't a usable character is asked for again here
+        for attempt in range(1, GENERATION_ATTEMPTS + 1):
+            response = claude37sonnet(prompt)
+            # Extract JSON from response
+            character_data = self._extract_json(response)
+            # Partial or malformed characters are never cached, so they can't be saved or reused
             try:
-                response = claude37sonnet(prompt)
-                # Extract JSON from response
-                npc_data = self._extract_json(response)
-                # Cache result
-                self.npc_cache[cache_key] = npc_data
-                
-                # Save to file if option is enabled
-                if self.save_generated:
-                    self.save_characters()
-                    
-            except Exception as e:
-                print(f"Error generating NPC: {e}")
-                # Fallback to default NPC
-                return self._create_default_npc(level)
+                _check_fields(character_data, fields)
+                break
+            except ValueError:
+                if attempt == GENERATION_ATTEMPTS:
+                    raise
+        character_data["mode"] = self._mode
+        # Cache result
+        cache[cache_key] = character_data
+        dirty_keys.add(cache_key)
+        self._remember_generated(kind, level, character_data)
+        
+        # Save to file if option is enabled
+        if save and self.save_generated:
+            self.save_characters()
+        return character_data
+    
+    def generate_npc(self, level: int = 1, save: bool = True) -> NPC:
+        """
+        Generate an NPC using Claude 3.7 Sonnet or from pre-generated data.
+        With save=False a newly generated NPC is left for the caller to save.
+        """
+        # Generate NPC using LLM with the appropriate template
+        if self.philosophical_mode:
+            prompt_parts = _PHILOSOPHICAL_NPC_PROMPT
+        else:
+            prompt_parts = _NPC_PROMPT
+            
+        try:
+            npc_data = self._character_data("npc", level, prompt_parts, NPC_FIELDS,
+                                           self.npc_cache, self._dirty_npcs, save)
+        except Exception as e:
+            self._errors.append(f"Error generating NPC: {e}")
+            # Fallback to default NPC
+            return self._create_default_npc(level)
         
         return self._create_npc_from_data(npc_data, level)
     
     def _create_npc_from_data(self, npc_data: dict, level: int) -> NPC:
         """Create an NPC instance from data."""
+        # Generated characters have every field, so look them up directly first
+        try:
+            return NPC(
+                name=npc_data["name"],
+                personality=npc_data["personality"],
+                dialogue=npc_data["dialogue"],
+                description=npc_data["description"]
+            )
+        except KeyError:
+            pass
+        
+        # Fill in defaults for the missing fields
         return NPC(
             name=npc_data.get("name", f"NPC Level {level}"),
             personality=npc_data.get("personality", "Mysterious"),
@@ -236,51 +582,43 @@ class NPCGenerator:
             description=npc_data.get("description", "A mysterious figure.")
         )
     
-    def generate_enemy(self, level: int = 1) -> Enemy:
-        """Generate an enemy using Claude 3.7 Sonnet or from pre-generated data."""
-        # Check if we should use pre-generated enemies
-        if self.use_pregenerated:
-            level_key = f"enemy_level_{level}"
-            # Find enemies for this level
-            level_enemies = [k for k in self.pregenerated_enemies.keys() if k.startswith(level_key)]
-            if level_enemies:
-                # Randomly choose one of the pre-generated enemies
-                cache_key = random.choice(level_enemies)
-                enemy_data = self.pregenerated_enemies[cache_key]
-                return self._create_enemy_from_data(enemy_data, level)
-        
-        # Generate a new enemy
-        # Check cache first
-        cache_key = f"enemy_level_{level}_{random.randint(1, 10000)}"
-        if cache_key in self.enemy_cache:
-            enemy_data = self.enemy_cache[cache_key]
+    def generate_enemy(self, level: int = 1, save: bool = True) -> Enemy:
+        """
+        Generate an enemy using Claude 3.7 Sonnet or from pre-generated data.
+        With save=False a newly generated enemy is left for the caller to save.
+        """
+        # Generate enemy using LLM with the appropriate template
+        if self.philosophical_mode:
+            prompt_parts = _PHILOSOPHICAL_ENEMY_PROMPT
         else:
-            # Generate enemy using LLM with the appropriate template
-            if self.philosophical_mode:
-                prompt = PHILOSOPHICAL_ENEMY_PROMPT_TEMPLATE.format(level=level)
-            else:
-                prompt = ENEMY_PROMPT_TEMPLATE.format(level=level)
-                
-            try:
-                response = claude37sonnet(prompt)
-                # Extract JSON from response
-                enemy_data = self._extract_json(response)
-                # Cache result
-                self.enemy_cache[cache_key] = enemy_data
-                
-                # Save to file if option is enabled
-                if self.save_generated:
-                    self.save_characters()
-                    
-            except Exception as e:
-                print(f"Error generating enemy: {e}")
-                # Fallback to default enemy
-                return self._create_default_enemy(level)
+            prompt_parts = _ENEMY_PROMPT
+            
+        try:
+            enemy_data = self._character_data("enemy", level, prompt_parts, ENEMY_FIELDS,
+                                             self.enemy_cache, self._dirty_enemies, save)
+        except Exception as e:
+            self._errors.append(f"Error generating enemy: {e}")
+            # Fallback to default enemy
+            return self._create_default_enemy(level)
         
         return self._create_enemy_from_data(enemy_data, level)
     
     def _create_enemy_from_data(self, enemy_data: dict, level: int) -> Enemy:
         """Create an Enemy instance from data."""
+        # Generated characters have every field, so look them up directly first
+        try:
+            return Enemy(
+                name=enemy_data["name"],
+                hp=enemy_data["hp"],
+                attack=enemy_data["attack"],
+                behavior=enemy_data["behavior"],
+                personality=enemy_data["personality"],
+                description=enemy_data["description"]
+            )
+        except KeyError:
+            pass
+        
+        # Fill in defaults for the missing fields
         return Enemy(
             name=enemy_data.get("name", f"Enemy Level {level}"),
             hp=enemy_data.get("hp", 10 + level * 5),
@@ -293,13 +631,11 @@ class NPCGenerator:
     def _extract_json(self, text: str) -> dict:
         """Extract JSON from LLM response text."""
         try:
-            # Try to find JSON object in the text
+            # Try to find JSON object in the text; any text after the object is ignored
             start_idx = text.find('{')
-            end_idx = text.rfind('}') + 1
             
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = text[start_idx:end_idx]
-                return json.loads(json_str)
+            if start_idx >= 0:
+                return _json_decoder.raw_decode(text, start_idx)[0]
             else:
                 # Fall back to default values
                 return {}
@@ -312,11 +648,7 @@ class NPCGenerator:
         return NPC(
             name=f"Dungeon Dweller {level}",
             personality="Mysterious",
-            dialogue=[
-                "Welcome, traveler.",
-                "These dungeons hold many secrets.",
-                "Be careful as you venture deeper."
-            ],
+            dialogue=_DEFAULT_NPC_DIALOGUE,
             description="A cloaked figure with glowing eyes, watching you carefully."
         )
     
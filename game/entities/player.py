@@ -4,6 +4,8 @@ from game.entities.entity import Entity
 class Player(Entity):
     """Player character class."""
     
+    __slots__ = ("hp", "max_hp", "attack", "inventory")
+    
     def __init__(self, name, x=0, y=0, hp=100, max_hp=100, attack=10):
         super().__init__(
             name=name,
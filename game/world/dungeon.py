@@ -1,6 +1,57 @@
 import random
 from typing import List, Dict, Any, Optional, Tuple
 
+# Tile types
+WALL = 0
+FLOOR = 1
+STAIRS = 2
+
+# Lookup tables from tile type to display character and color pair, for bytes.translate
+TILE_CHARS = bytes.maketrans(bytes([WALL, FLOOR, STAIRS]), b"#.>")
+TILE_COLORS = bytes.maketrans(bytes([WALL, FLOOR, STAIRS]), bytes([1, 1, 4]))  # Stairs are yellow
+# Lookup table from tile type to a binary digit that is 1 for walkable tiles
+WALKABLE_DIGITS = bytes.maketrans(bytes([WALL, FLOOR, STAIRS]), b"011")
+
+# Offsets of a position and its eight neighbours
+ADJACENT_OFFSETS = tuple((dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+
+
+def _make_is_walkable(tiles, width, height, entity_positions):
+    """Build a walkability check that keeps a dungeon's data in closure variables."""
+    occupant = entity_positions.get
+    
+    def is_walkable(x: int, y: int) -> bool:
+        """Check if a tile is walkable (floor or stairs)."""
+        # Check if in bounds
+        if not (0 <= x < width and 0 <= y < height):
+            return False
+            
+        # Check if tile is floor or stairs: every tile but a wall is walkable
+        if tiles[y * width + x] == WALL:
+            return False
+            
+        # Check if there's a blocking entity
+        entity = occupant((x, y))
+        if entity is not None and entity.blocks_movement:
+            return False
+            
+        return True
+        
+    return is_walkable
+
+
+def roll_character_counts(level: int) -> Tuple[int, int]:
+    """Pick how many NPCs and enemies a level gets."""
+    return random.randint(1, 3), random.randint(2, 5 + level)
+
+
+def _discard(entities, entity):
+    """Remove an entity from a list if it is there, scanning the list only once."""
+    try:
+        entities.remove(entity)
+    except ValueError:
+        pass
+
 
 class Dungeon:
     """Represents a dungeon level with tiles and entities."""
@@ -8,135 +59,196 @@ class Dungeon:
     def __init__(self, width, height):
         self.width = width
         self.height = height
-        self.tiles = [[0 for y in range(height)] for x in range(width)]
+        # Tile types stored row by row in one flat array: (x, y) is at y * width + x
+        self.tiles = bytearray(width * height)  # Starts as all walls
         self.entities = []
         self.npcs = []
         self.enemies = []
         self.items = []
+        # Set by the map generator when it places the stairs down
+        self.stairs_pos = None
+        
+        # Entities indexed by (x, y) so position checks don't scan entity lists.
+        # Spawning and movement keep at most one entity per tile.
+        self.entity_positions = {}
+        
+        # Movement checks run for every step of every entity, so is_walkable is a closure over
+        # the tile array and position index instead of a method looking them up on self.
+        # Both are only ever modified in place, never replaced.
+        self.is_walkable = _make_is_walkable(self.tiles, width, height, self.entity_positions)
+        
+        # Flat indices of floor and stairs tiles, rebuilt after the tiles change
+        self._walkable_indices = None
+        
+        # Set whenever tiles or entity positions change; the game clears it once it has rendered
+        self.changed = True
+        # Incremented on every tile change, so drawn copies of the tiles can tell they are stale
+        self.tiles_version = 0
         
-        # Tile types:
-        # 0: Wall
-        # 1: Floor
-        # 2: Stairs
+    def get_tile(self, x: int, y: int) -> int:
+        """Return the tile type at the given position."""
+        return self.tiles[y * self.width + x]
+        
+    def set_tile(self, x: int, y: int, tile: int):
+        """Set the tile type at the given position."""
+        self.tiles[y * self.width + x] = tile
+        self._walkable_indices = None
+        self.changed = True
+        self.tiles_version += 1
+        
+    def fill_tiles(self, start: int, stop: int, tile: int, step: int = 1):
+        """Set every step-th tile of the flat array from start up to (not including) stop."""
+        self.tiles[start:stop:step] = bytes([tile]) * len(range(start, stop, step))
+        self._walkable_indices = None
+        self.changed = True
+        self.tiles_version += 1
+        
+    def has_path(self, start: Tuple[int, int], end: Tuple[int, int]) -> bool:
+        """Check if end can be reached from start in up/down/left/right steps on walkable tiles."""
+        width = self.width
+        
+        # Flood fill on bitmasks where bit y * width + x stands for tile (x, y), so each
+        # step grows the reached area by one tile in every direction at once
+        walkable = int(self.tiles.translate(WALKABLE_DIGITS)[::-1], 2)
+        for (x, y), entity in self.entity_positions.items():
+            if entity.blocks_movement:
+                walkable &= ~(1 << (y * width + x))
+                
+        # Masks that stop horizontal steps from wrapping onto the next row
+        row = (1 << (width - 1)) - 1
+        not_last_column = sum(row << (y * width) for y in range(self.height))
+        not_first_column = not_last_column << 1
+        
+        reached = 1 << (start[1] * width + start[0])
+        target = 1 << (end[1] * width + end[0])
+        while not reached & target:
+            neighbours = (((reached & not_last_column) << 1) |
+                          ((reached & not_first_column) >> 1) |
+                          (reached << width) |
+                          (reached >> width))
+            grown = reached | (neighbours & walkable)
+            if grown == reached:
+                return False
+            reached = grown
+            
+        return True
+        
+    def carve_direct_path(self, start: Tuple[int, int], end: Tuple[int, int]):
+        """
+        Carve floor from start to end: along start's row, then down or up end's column.
+        A walkable end tile, such as the stairs the path is carved to, is kept.
+        """
+        x1, y1 = start
+        x2, y2 = end
+        width = self.width
+        end_tile = self.tiles[y2 * width + x2]
+        
+        # First carve horizontal tunnel
+        self.fill_tiles(y1 * width + min(x1, x2), y1 * width + max(x1, x2) + 1, FLOOR)
+        
+        # Then carve vertical tunnel (every width-th tile of the flat array)
+        self.fill_tiles(min(y1, y2) * width + x2, max(y1, y2) * width + x2 + 1, FLOOR, step=width)
+        
+        # Both tunnels end on the end cell; put back the stairs instead of leaving floor there
+        if end_tile != WALL:
+            self.tiles[y2 * width + x2] = end_tile
         
     def render(self, renderer):
         """Render the dungeon tiles."""
-        for x in range(self.width):
-            for y in range(self.height):
-                if self.tiles[x][y] == 0:  # Wall
-                    renderer.draw_tile(x, y, "#")
-                elif self.tiles[x][y] == 1:  # Floor
-                    renderer.draw_tile(x, y, ".")
-                elif self.tiles[x][y] == 2:  # Stairs
-                    renderer.draw_tile(x, y, ">", 4)  # Yellow color
+        # Translate whole rows of tile types at once instead of drawing tile by tile
+        for y in range(self.height):
+            row = self.tiles[y * self.width:(y + 1) * self.width]
+            renderer.draw_row(0, y, row.translate(TILE_CHARS).decode("ascii"), row.translate(TILE_COLORS))
                     
     def render_entities(self, renderer):
         """Render all entities in the dungeon."""
-        for entity in self.entities:
-            entity.render(renderer)
-            
-    def is_walkable(self, x: int, y: int) -> bool:
-        """Check if a tile is walkable (floor or stairs)."""
-        # Check if in bounds
-        if not (0 <= x < self.width and 0 <= y < self.height):
-            return False
-            
-        # Check if tile is floor or stairs
-        if self.tiles[x][y] not in (1, 2):
-            return False
+        renderer.draw_entities(self.entities)
             
-        # Check if there's a blocking entity
-        for entity in self.entities:
-            if entity.x == x and entity.y == y and entity.blocks_movement:
-                return False
-                
-        return True
-        
     def is_level_exit(self, x: int, y: int) -> bool:
         """Check if a tile is the exit to the next level (stairs)."""
         if not (0 <= x < self.width and 0 <= y < self.height):
             return False
             
-        return self.tiles[x][y] == 2
+        return self.tiles[y * self.width + x] == STAIRS
+        
+    def _get_walkable_indices(self) -> List[int]:
+        """Return the flat indices of the floor and stairs tiles."""
+        if self._walkable_indices is None:
+            self._walkable_indices = [
+                i for i, tile in enumerate(self.tiles) if tile != WALL
+            ]
+        return self._walkable_indices
         
     def get_random_floor_tile(self) -> Tuple[int, int]:
         """Return a random walkable position."""
+        walkable_indices = self._get_walkable_indices()
+            
+        # Only blocking entities can still reject a pick
         while True:
-            x = random.randint(1, self.width - 2)
-            y = random.randint(1, self.height - 2)
+            y, x = divmod(random.choice(walkable_indices), self.width)
             
             if self.is_walkable(x, y):
                 return (x, y)
                 
-    def populate_entities(self, npc_generator, level: int = 0):
-        """Populate the dungeon with NPCs and enemies."""
+    def populate_entities(self, npc_generator, level: int = 0, counts: Optional[Tuple[int, int]] = None):
+        """Populate the dungeon with NPCs and enemies (counts picked in advance, or rolled now)."""
         # Clear existing entities
         self.entities = []
         self.npcs = []
         self.enemies = []
+        self.entity_positions.clear()
         
-        # Find stairs position
-        stairs_pos = None
-        for x in range(self.width):
-            for y in range(self.height):
-                if self.tiles[x][y] == 2:
-                    stairs_pos = (x, y)
-                    break
-            if stairs_pos:
-                break
-                
-        # Generate NPCs
-        num_npcs = random.randint(1, 3)
-        for _ in range(num_npcs):
-            # Get a random position on a floor tile
-            while True:
-                x, y = self.get_random_floor_tile()
+        # Stairs position, kept clear of spawns
+        stairs_pos = self.stairs_pos
                 
-                # Make sure the spot is clear and not too close to stairs
-                if (self.is_position_clear(x, y) and 
-                    (stairs_pos is None or 
-                     abs(x - stairs_pos[0]) > 2 or 
-                     abs(y - stairs_pos[1]) > 2)):
-                    break
-                    
-            # Generate a new NPC
-            npc = npc_generator.generate_npc(level)
-            npc.x = x
-            npc.y = y
+        # Generate NPCs and enemies together, so their LLM calls overlap
+        num_npcs, num_enemies = counts or roll_character_counts(level)
+        npcs, enemies = npc_generator.generate_many(level, num_npcs, num_enemies)
+        
+        # Place them on clear floor tiles (characters that don't fit are left out)
+        for character, (x, y) in zip(npcs + enemies, self._spawn_positions(stairs_pos)):
+            self.add_entity(character, x, y)
             
-            # Add to entities list
-            self.entities.append(npc)
-            self.npcs.append(npc)
+    def _spawn_positions(self, stairs_pos: Optional[Tuple[int, int]]):
+        """Yield clear floor tiles not too close to the stairs, in random order and each only once."""
+        walkable_indices = self._get_walkable_indices()
+        for index in random.sample(walkable_indices, len(walkable_indices)):
+            y, x = divmod(index, self.width)
             
-        # Generate enemies
-        num_enemies = random.randint(2, 5 + level)
-        for _ in range(num_enemies):
-            # Get a random position on a floor tile
-            while True:
-                x, y = self.get_random_floor_tile()
+            # Test the cheap stairs distance before the entity lookup
+            if (stairs_pos is not None and
+                abs(x - stairs_pos[0]) <= 2 and
+                abs(y - stairs_pos[1]) <= 2):
+                continue
                 
-                # Make sure the spot is clear and not too close to stairs
-                if (self.is_position_clear(x, y) and 
-                    (stairs_pos is None or 
-                     abs(x - stairs_pos[0]) > 2 or 
-                     abs(y - stairs_pos[1]) > 2)):
-                    break
-                    
-            # Generate a new enemy
-            enemy = npc_generator.generate_enemy(level)
-            enemy.x = x
-            enemy.y = y
+            if self.is_position_clear(x, y):
+                yield (x, y)
             
-            # Add to entities list
-            self.entities.append(enemy)
-            self.enemies.append(enemy)
+    def add_entity(self, entity, x: int, y: int):
+        """Place an entity in the dungeon at the given position."""
+        entity.x = x
+        entity.y = y
+        entity.dungeon = self
+        self.entities.append(entity)
+        if entity.entity_type == "npc":
+            self.npcs.append(entity)
+        elif entity.entity_type == "enemy":
+            self.enemies.append(entity)
+        self.entity_positions[(x, y)] = entity
+        self.changed = True
+        
+    def move_entity(self, entity, x: int, y: int):
+        """Move an entity to a new position and update the position index."""
+        if self.entity_positions.get((entity.x, entity.y)) is entity:
+            del self.entity_positions[(entity.x, entity.y)]
+        entity.x = x
+        entity.y = y
+        self.entity_positions[(x, y)] = entity
+        self.changed = True
             
     def is_position_clear(self, x: int, y: int) -> bool:
         """Check if a position is clear of entities."""
-        for entity in self.entities:
-            if entity.x == x and entity.y == y:
-                return False
-        return True
+        return (x, y) not in self.entity_positions
         
     def update_entities(self, player):
         """Update all entities in the dungeon."""
@@ -145,25 +257,31 @@ class Dungeon:
             
     def get_adjacent_npc(self, x: int, y: int) -> Optional[Any]:
         """Get an NPC adjacent to the given position."""
-        for npc in self.npcs:
-            if abs(npc.x - x) <= 1 and abs(npc.y - y) <= 1:
-                return npc
-        return None
+        return self._get_adjacent_entity(x, y, "npc")
         
     def get_adjacent_enemy(self, x: int, y: int) -> Optional[Any]:
         """Get an enemy adjacent to the given position."""
-        for enemy in self.enemies:
-            if abs(enemy.x - x) <= 1 and abs(enemy.y - y) <= 1:
-                return enemy
+        return self._get_adjacent_entity(x, y, "enemy")
+        
+    def _get_adjacent_entity(self, x: int, y: int, entity_type: str) -> Optional[Any]:
+        """Get an entity of the given type on or next to the given position."""
+        for dx, dy in ADJACENT_OFFSETS:
+            entity = self.entity_positions.get((x + dx, y + dy))
+            if entity is not None and entity.entity_type == entity_type:
+                return entity
         return None
         
     def remove_entity(self, entity):
         """Remove an entity from the dungeon."""
-        if entity in self.entities:
-            self.entities.remove(entity)
+        _discard(self.entities, entity)
+            
+        if self.entity_positions.get((entity.x, entity.y)) is entity:
+            del self.entity_positions[(entity.x, entity.y)]
+        entity.dungeon = None
+        self.changed = True
             
         # Remove from specific lists
-        if entity.entity_type == "npc" and entity in self.npcs:
-            self.npcs.remove(entity)
-        elif entity.entity_type == "enemy" and entity in self.enemies:
-            self.enemies.remove(entity) 
\ No newline at end of file
+        if entity.entity_type == "npc":
+            _discard(self.npcs, entity)
+        elif entity.entity_type == "enemy":
+            _discard(self.enemies, entity) 
\ No newline at end of file
@@ -1,24 +1,21 @@
 import random
 from typing import List, Tuple, Dict, Any
-from game.world.dungeon import Dungeon
-from collections import deque
+from game.world.dungeon import Dungeon, FLOOR, STAIRS
 
 
 class Room:
     """Represents a room in the dungeon."""
     
+    # Fixed attribute slots; intersects() reads all four corners of every room placed so far
+    __slots__ = ("x1", "y1", "x2", "y2", "center")
+    
     def __init__(self, x1, y1, x2, y2):
         self.x1 = x1  # Top left x
         self.y1 = y1  # Top left y
         self.x2 = x2  # Bottom right x
         self.y2 = y2  # Bottom right y
-        
-    @property
-    def center(self):
-        """Return the center coordinates of the room."""
-        center_x = (self.x1 + self.x2) // 2
-        center_y = (self.y1 + self.y2) // 2
-        return (center_x, center_y)
+        # Rooms never change, so the center coordinates are worked out once
+        self.center = ((x1 + x2) // 2, (y1 + y2) // 2)
         
     def intersects(self, other):
         """Check if this room intersects with another room."""
@@ -33,36 +30,35 @@ class Room:
 class MapGenerator:
     """Generates random dungeon maps."""
     
-    def __init__(self, width=80, height=20):
+    def __init__(self, width=80, height=20, seed=None):
         self.width = width
         self.height = height
         self.max_rooms = 10  # Maximum number of rooms
         self.min_room_size = 5  # Minimum size of each room
         self.max_room_size = 10  # Maximum size of each room
         self.rooms = []  # Store generated rooms for external access
+        # Own random number generator, so a seed reproduces a map
+        self.rng = random.Random(seed)
         
     def generate_dungeon(self, level=0) -> Dungeon:
         """Generate a new dungeon level."""
-        # Create a new dungeon
+        # Create a new dungeon (its tiles start out as walls)
         dungeon = Dungeon(self.width, self.height)
         
-        # Fill dungeon with walls
-        for x in range(self.width):
-            for y in range(self.height):
-                dungeon.tiles[x][y] = 0  # Wall
-        
         # Generate rooms
         self.rooms = []  # Reset rooms
         num_rooms = 0
+        # Bound once, these are called several times for every room
+        randint, chance = self.rng.randint, self.rng.random
         
         for r in range(self.max_rooms):
             # Random room size
-            w = random.randint(self.min_room_size, self.max_room_size)
-            h = random.randint(self.min_room_size, self.max_room_size)
+            w = randint(self.min_room_size, self.max_room_size)
+            h = randint(self.min_room_size, self.max_room_size)
             
             # Random room position
-            x = random.randint(1, self.width - w - 1)
-            y = random.randint(1, self.height - h - 1)
+            x = randint(1, self.width - w - 1)
+            y = randint(1, self.height - h - 1)
             
             new_room = Room(x, y, x + w, y + h)
             
@@ -81,7 +77,7 @@ class MapGenerator:
                     
                     # Randomly decide whether to carve horizontal then vertical 
                     # or vertical then horizontal
-                    if random.random() < 0.5:
+                    if chance() < 0.5:
                         self._carve_h_tunnel(dungeon, prev_x, curr_x, prev_y)
                         self._carve_v_tunnel(dungeon, prev_y, curr_y, curr_x)
                     else:
@@ -90,12 +86,12 @@ class MapGenerator:
                     
                     # Add some additional connections for redundancy (20% chance)
                     # This creates loops in the dungeon for more interesting navigation
-                    if num_rooms > 1 and random.random() < 0.2:
+                    if num_rooms > 1 and chance() < 0.2:
                         # Connect to a random previous room
-                        rand_room_idx = random.randint(0, num_rooms - 1)
+                        rand_room_idx = randint(0, num_rooms - 1)
                         rand_x, rand_y = self.rooms[rand_room_idx].center
                         
-                        if random.random() < 0.5:
+                        if chance() < 0.5:
                             self._carve_h_tunnel(dungeon, curr_x, rand_x, curr_y)
                             self._carve_v_tunnel(dungeon, curr_y, rand_y, rand_x)
                         else:
@@ -110,74 +106,29 @@ class MapGenerator:
         if self.rooms:
             last_room = self.rooms[-1]
             sx, sy = last_room.center
-            dungeon.tiles[sx][sy] = 2  # Stairs
+            dungeon.set_tile(sx, sy, STAIRS)
+            dungeon.stairs_pos = (sx, sy)
             
             # Verify path from first room to stairs
-            if not self._verify_path(dungeon, self.rooms[0].center, (sx, sy)):
+            if not dungeon.has_path(self.rooms[0].center, (sx, sy)):
                 # If no path exists, force create a direct path
-                self._create_direct_path(dungeon, self.rooms[0].center, (sx, sy))
+                dungeon.carve_direct_path(self.rooms[0].center, (sx, sy))
         
         # Return the generated dungeon
         return dungeon
     
     def _carve_room(self, dungeon, room):
         """Carve a room in the dungeon."""
-        for x in range(room.x1 + 1, room.x2):
-            for y in range(room.y1 + 1, room.y2):
-                dungeon.tiles[x][y] = 1  # Floor
+        # Each room row is a contiguous run of the flat tile array
+        for y in range(room.y1 + 1, room.y2):
+            dungeon.fill_tiles(y * self.width + room.x1 + 1, y * self.width + room.x2, FLOOR)
     
     def _carve_h_tunnel(self, dungeon, x1, x2, y):
         """Carve a horizontal tunnel."""
-        for x in range(min(x1, x2), max(x1, x2) + 1):
-            dungeon.tiles[x][y] = 1  # Floor
+        dungeon.fill_tiles(y * self.width + min(x1, x2), y * self.width + max(x1, x2) + 1, FLOOR)
     
     def _carve_v_tunnel(self, dungeon, y1, y2, x):
         """Carve a vertical tunnel."""
-        for y in range(min(y1, y2), max(y1, y2) + 1):
-            dungeon.tiles[x][y] = 1  # Floor
-            
-    def _verify_path(self, dungeon, start, end):
-        """
-        Use BFS to verify that a path exists from start to end.
-        Returns True if a path exists, False otherwise.
-        """
-        # Create a visited set
-        visited = set()
-        queue = deque([start])
-        
-        # Directions: up, right, down, left
-        directions = [(0, -1), (1, 0), (0, 1), (-1, 0)]
-        
-        while queue:
-            current = queue.popleft()
-            
-            if current == end:
-                return True
-                
-            if current in visited:
-                continue
-                
-            visited.add(current)
-            
-            # Check all adjacent tiles
-            for dx, dy in directions:
-                next_x, next_y = current[0] + dx, current[1] + dy
-                
-                # Check if walkable and not visited
-                if (dungeon.is_walkable(next_x, next_y) and 
-                    (next_x, next_y) not in visited):
-                    queue.append((next_x, next_y))
-        
-        # If queue is empty and end not found, no path exists
-        return False
-        
-    def _create_direct_path(self, dungeon, start, end):
-        """Create a direct path from start to end coordinates."""
-        x1, y1 = start
-        x2, y2 = end
-        
-        # First carve horizontal tunnel
-        self._carve_h_tunnel(dungeon, x1, x2, y1)
-        
-        # Then carve vertical tunnel
-        self._carve_v_tunnel(dungeon, y1, y2, x2) 
\ No newline at end of file
+        # A column is every width-th tile of the flat array
+        dungeon.fill_tiles(min(y1, y2) * self.width + x, max(y1, y2) * self.width + x + 1,
+                           FLOOR, step=self.width)
@@ -9,6 +9,7 @@ Usage:
   python main.py --no-save-characters   # Generate characters without saving them
   python main.py --use-pregenerated     # Use pre-generated characters instead of generating new ones
   python main.py --philosophical-mode    # Generate characters who discuss advanced STEM/philosophical concepts
+  python main.py --reuse-characters 0.5 # Reuse a saved character for a level half of the time
   
 Controls:
   Arrow keys: Move the player character
@@ -19,8 +20,6 @@ Controls:
   q: Quit the game
 """
 
-import sys
-import os
 from game.engine.game import main
 
 if __name__ == "__main__":
@@ -21,6 +21,16 @@ portkey_google = Portkey(
     virtual_key=os.getenv("PORTKEY_VIRTUAL_KEY_GOOGLE")
 )
 
+# Set PORTKEY_LATENCY_OPTIMIZED=1 when the Anthropic virtual key routes to a provider that
+# offers latency-optimized inference for Claude (such as Amazon Bedrock)
+LATENCY_OPTIMIZED = os.getenv("PORTKEY_LATENCY_OPTIMIZED") == "1"
+
+def _latency_options(latency_optimized):
+    """Extra completion arguments requesting latency-optimized inference, when it is enabled"""
+    if latency_optimized and LATENCY_OPTIMIZED:
+        return {"performance_config": {"latency": "optimized"}}
+    return {}
+
 def claude35sonnet(prompt):
     """Wrapper function for Claude 3.5 Sonnet"""
     completion = portkey_anthropic.chat.completions.create(
@@ -30,15 +40,47 @@ def claude35sonnet(prompt):
     )
     return completion.choices[0].message.content
 
-def claude37sonnet(prompt):
+def claude37sonnet(prompt, latency_optimized=False):
     """Wrapper function for Claude 3.7 Sonnet"""
     completion = portkey_anthropic.chat.completions.create(
         messages=[{"role": "user", "content": prompt}],
         model="claude-3-7-sonnet-latest",
-        max_tokens=8192
+        max_tokens=8192,
+        **_latency_options(latency_optimized)
     )
     return completion.choices[0].message.content
 
+def claude35haiku(prompt, latency_optimized=False):
+    """Wrapper function for Claude 3.5 Haiku"""
+    completion = portkey_anthropic.chat.completions.create(
+        messages=[{"role": "user", "content": prompt}],
+        model="claude-3-5-haiku-latest",
+        max_tokens=8192,
+        **_latency_options(latency_optimized)
+    )
+    return completion.choices[0].message.content
+
+def _stream_anthropic(prompt, model, latency_optimized=False):
+    """Yield the pieces of an Anthropic completion as they arrive"""
+    stream = portkey_anthropic.chat.completions.create(
+        messages=[{"role": "user", "content": prompt}],
+        model=model,
+        max_tokens=8192,
+        stream=True,
+        **_latency_options(latency_optimized)
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+def claude37sonnet_stream(prompt, latency_optimized=False):
+    """Streaming wrapper function for Claude 3.7 Sonnet"""
+    return _stream_anthropic(prompt, "claude-3-7-sonnet-latest", latency_optimized)
+
+def claude35haiku_stream(prompt, latency_optimized=False):
+    """Streaming wrapper function for Claude 3.5 Haiku"""
+    return _stream_anthropic(prompt, "claude-3-5-haiku-latest", latency_optimized)
+
 def gpt4o(prompt):
     """Wrapper function for GPT-4"""
     completion = portkey_openai.chat.completions.create(